@@ -1,11 +1,93 @@
 # agents/case_study_agent.py - Retrieves Relevant Case Studies Using RAG
 
 import json
+import os
+import hashlib
+import functools
+import asyncio
+import atexit
+from collections import ChainMap
+from operator import itemgetter
+from concurrent.futures import ThreadPoolExecutor
 import faiss
 import numpy as np
 from sentence_transformers import SentenceTransformer
 from typing import Dict, List
 from utils.mcp import create_mcp
+from utils.onnx_embedder import OnnxSentenceEncoder
+from utils.semantic_cache import SemanticCache
+
+# Index tiers by corpus size:
+# - below HNSW_MIN_CASES, an exact scan as one NumPy matmul (a single BLAS
+#   pass beats graph traversal at this size)
+# - up to IVF_PQ_MIN_CASES, an HNSW graph over 8-bit scalar-quantized vectors
+#   (logarithmic search, 4x less vector memory than FP32)
+# - beyond that, a compressed IVF+PQ index to bound memory
+HNSW_MIN_CASES = 500
+HNSW_M = 32
+HNSW_EF_CONSTRUCTION = 200
+IVF_PQ_MIN_CASES = 100_000
+IVF_PQ_FACTORY = "IVF64,PQ48x8"
+
+EMBEDDING_MODEL_NAME = 'sentence-transformers/all-MiniLM-L6-v2'
+
+# On graph/IVF indexes, project briefs whose embeddings are at least this
+# similar reuse each other's search results. The exact NumPy scan is cheaper
+# than a cache lookup, so small corpora are never cached.
+SEMANTIC_CACHE_THRESHOLD = 0.95
+
+# Pin FAISS's OpenMP pool to roughly the physical core count (cpu_count()
+# reports hyperthreads) to avoid oversubscribing shared servers
+faiss.omp_set_num_threads(max(1, (os.cpu_count() or 2) // 2))
+
+class _BruteForceIndex:
+    """
+    Exact inner-product search over an in-memory embedding matrix.
+    
+    Mirrors the subset of the FAISS index API the agent uses (add, search,
+    ntotal). Scores for all queries come from a single BLAS matmul and the
+    top-k are selected with argpartition, so there is no per-document Python
+    work. Rows are re-normalized on add, so scores are cosine similarities.
+    """
+    
+    def __init__(self, dimension: int):
+        self._E = np.empty((0, dimension), dtype=np.float32)
+    
+    @property
+    def ntotal(self) -> int:
+        return len(self._E)
+    
+    def add(self, embeddings: np.ndarray):
+        E = np.asarray(embeddings, dtype=np.float32)
+        norms = np.linalg.norm(E, axis=1, keepdims=True)
+        E = E / np.maximum(norms, 1e-12)
+        self._E = np.ascontiguousarray(np.vstack([self._E, E]))
+    
+    def search(self, queries: np.ndarray, k: int):
+        """
+        Return (scores, indices) of the k best rows per query, best first.
+        
+        Like FAISS, slots beyond the corpus size are padded with index -1.
+        """
+        
+        scores = np.asarray(queries, dtype=np.float32) @ self._E.T  # (n_queries, N)
+        n_queries, n = scores.shape
+        kk = min(k, n)
+        
+        if kk == 1:
+            top = np.argmax(scores, axis=1)[:, None]
+        elif kk > 0:
+            top = np.argpartition(-scores, kk - 1, axis=1)[:, :kk]
+            order = np.argsort(-np.take_along_axis(scores, top, axis=1), axis=1)
+            top = np.take_along_axis(top, order, axis=1)
+        else:
+            top = np.empty((n_queries, 0), dtype=np.int64)
+        
+        D = np.full((n_queries, k), -np.inf, dtype=np.float32)
+        I = np.full((n_queries, k), -1, dtype=np.int64)
+        D[:, :kk] = np.take_along_axis(scores, top, axis=1)
+        I[:, :kk] = top
+        return D, I
 
 class CaseStudyAgent:
     """
@@ -19,7 +101,11 @@ class CaseStudyAgent:
     5. Relevant case study retrieval
     """
     
-    def __init__(self, case_studies_path: str = "data/case_studies.json"):
+    def __init__(self, case_studies_path: str = "data/case_studies.json", nprobe: int = 8,
+                 ef_search: int = 64,
+                 embedding_cache_path: str = "data/.case_embed_cache.npz",
+                 onnx_export_dir: str = "data/.onnx_minilm",
+                 semantic_cache_path: str = "data/.case_semantic_cache.npz"):
         """
         Initialize case study agent with RAG components.
         
@@ -27,8 +113,31 @@ class CaseStudyAgent:
         1. Load case studies from JSON
         2. Initialize sentence transformer model
         3. Build FAISS index for similarity search
+        
+        Args:
+            case_studies_path: Path to the case studies JSON file
+            nprobe: Number of IVF clusters probed per query (IVF indexes only)
+            ef_search: HNSW candidate list size per query (HNSW indexes only)
+            embedding_cache_path: On-disk cache of case study embeddings
+            onnx_export_dir: Directory for the int8 ONNX query encoder
+            semantic_cache_path: File the semantic search cache persists to at exit
         """
         
+        self.nprobe = nprobe
+        self.ef_search = ef_search
+        self.embedding_cache_path = embedding_cache_path
+        self.index = None
+        self.query_encoder = None
+        self.semantic_cache = None
+        self.semantic_cache_path = semantic_cache_path
+        self._exec = ThreadPoolExecutor(max_workers=2, thread_name_prefix="case-study")
+        
+        # Memoize query embeddings - repeated project briefs skip the encoder
+        self._encode_query = functools.lru_cache(maxsize=512)(self._encode_query_uncached)
+        
+        # Memoize full (query, k) -> search results; cleared whenever the index is rebuilt
+        self._search = functools.lru_cache(maxsize=256)(self._search_uncached)
+        
         # Load case studies from JSON file
         try:
             with open(case_studies_path, 'r') as f:
@@ -41,14 +150,29 @@ class CaseStudyAgent:
         
         # Initialize sentence transformer model for embeddings
         print("🔄 Loading sentence transformer model...")
-        self.embedding_model = SentenceTransformer('sentence-transformers/all-MiniLM-L6-v2')
+        self.embedding_model = SentenceTransformer(EMBEDDING_MODEL_NAME)
         print("✅ Embedding model loaded")
         
+        # Quantized ONNX encoder for the per-request query path
+        try:
+            self.query_encoder = OnnxSentenceEncoder(EMBEDDING_MODEL_NAME, onnx_export_dir)
+            print("✅ ONNX query encoder loaded")
+        except ImportError as e:
+            print(f"Warning: ONNX query encoder unavailable ({e}), using sentence-transformers")
+            print("Install with: pip install optimum[onnxruntime]")
+            self.query_encoder = None
+        except Exception as e:
+            # Export/quantization/session setup failed (offline hub, partial
+            # export dir, full disk...); the SentenceTransformer still works
+            print(f"Warning: ONNX query encoder failed to load ({e}), using sentence-transformers")
+            self.query_encoder = None
+        
         # Build FAISS index for similarity search
         if self.case_studies:
             print("🔄 Building FAISS index...")
             self._build_index()
             print("✅ FAISS index built successfully")
+            atexit.register(self._save_semantic_cache)
         else:
             self.index = None
     
@@ -63,63 +187,148 @@ class CaseStudyAgent:
         4. Vector normalization for cosine similarity
         """
         
-        # Create embeddings for each case study
-        case_study_texts = []
-        for case in self.case_studies:
-            # Combine relevant fields for embedding
-            text = f"{case['title']} {case['industry']} {case['project_type']} {case['description']}"
-            case_study_texts.append(text)
+        # Combine relevant fields for embedding (field tuple built by itemgetter in C)
+        fields = itemgetter("title", "industry", "project_type", "description")
+        case_study_texts = [" ".join(fields(case)) for case in self.case_studies]
         
         print(f"🔄 Generating embeddings for {len(case_study_texts)} case studies...")
         
-        # Generate embeddings using sentence transformer
-        embeddings = self.embedding_model.encode(case_study_texts)
+        # Generate L2-normalized embeddings (reusing cached rows for unchanged case studies)
+        embeddings = self._embed_case_texts(case_study_texts)
         
         # Build FAISS index
         dimension = embeddings.shape[1]  # Embedding dimension (384 for MiniLM)
-        self.index = faiss.IndexFlatIP(dimension)  # Inner product similarity
-        
-        # Normalize embeddings for cosine similarity
-        faiss.normalize_L2(embeddings)
+        if len(embeddings) >= IVF_PQ_MIN_CASES:
+            # Clustered + product-quantized index: probes only nprobe lists and
+            # stores ~48 bytes per vector instead of the full FP32 embedding
+            self.index = faiss.index_factory(dimension, IVF_PQ_FACTORY, faiss.METRIC_INNER_PRODUCT)
+            self.index.train(embeddings)
+        elif len(embeddings) >= HNSW_MIN_CASES:
+            # Navigable small-world graph: ~log(N) distance computations per
+            # query with high recall at efSearch=64. Vectors are stored as
+            # int8 codes (per-dimension range trained on the corpus), which
+            # quarters the memory streamed per distance with negligible
+            # recall loss on normalized embeddings
+            self.index = faiss.IndexHNSWSQ(
+                dimension, faiss.ScalarQuantizer.QT_8bit, HNSW_M, faiss.METRIC_INNER_PRODUCT
+            )
+            self.index.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+            self.index.hnsw.efSearch = self.ef_search
+            self.index.train(embeddings)
+        else:
+            # Exact inner-product scan: one sgemm over a contiguous float32 matrix
+            self.index = _BruteForceIndex(dimension)
         
         # Add embeddings to index
-        self.index.add(embeddings.astype('float32'))
+        self.index.add(embeddings)
+        
+        # Cached search results refer to the previous corpus
+        self._search.cache_clear()
+        
+        # Near-duplicate query cache for the approximate (HNSW / IVF-PQ) tiers,
+        # tied to this exact corpus so persisted entries are dropped when the
+        # case studies change
+        self.semantic_cache = None
+        if len(embeddings) >= HNSW_MIN_CASES:
+            corpus_fingerprint = hashlib.sha256(
+                "\n".join([EMBEDDING_MODEL_NAME, *case_study_texts]).encode('utf-8')
+            ).hexdigest()
+            self.semantic_cache = SemanticCache(dimension, threshold=SEMANTIC_CACHE_THRESHOLD, tag=corpus_fingerprint)
+            if self.semantic_cache.load(self.semantic_cache_path):
+                print(f"✅ Loaded {len(self.semantic_cache)} cached searches")
         
         print(f"✅ FAISS index created: {self.index.ntotal} vectors, {dimension} dimensions")
     
-    def retrieve_relevant_cases(self, project_mcp: Dict, k: int = 3) -> Dict:
+    def _embed_case_texts(self, texts: List[str]) -> np.ndarray:
         """
-        Retrieve most relevant case studies for the project.
+        Embed case study texts, re-encoding only those missing from the disk cache.
         
-        Key concepts:
-        1. Query text construction from project details
-        2. Query embedding generation
-        3. FAISS similarity search
-        4. Result ranking and filtering
-        5. Structured response creation
+        Embeddings are L2-normalized by the encoder itself, so inner product equals
+        cosine similarity. Rows are keyed by the SHA-256 of the model name and
+        text, so restarts with an unchanged JSON skip transformer inference
+        entirely and edits only re-embed the changed case studies.
         
         Args:
-            project_mcp: MCP message with project details
-            k: Number of case studies to retrieve
+            texts: Combined case study texts to embed
             
         Returns:
-            MCP message with relevant case studies
+            Normalized float32 embedding matrix with one row per text
         """
         
-        # Check if index is available
-        if self.index is None or len(self.case_studies) == 0:
-            print("⚠️ No case studies available for retrieval")
-            return create_mcp(
-                sender="CaseStudyAgent",
-                receiver="Orchestrator",
-                msg_type="CASE_STUDIES_RETRIEVED",
-                payload={"relevant_cases": []}
+        keys = [
+            hashlib.sha256(f"{EMBEDDING_MODEL_NAME}:normalized\n{text}".encode('utf-8')).hexdigest()
+            for text in texts
+        ]
+        
+        # Load previously computed embeddings
+        cached = {}
+        if os.path.exists(self.embedding_cache_path):
+            try:
+                with np.load(self.embedding_cache_path) as cache_file:
+                    cached = dict(zip(cache_file["keys"].tolist(), cache_file["embeddings"]))
+            except Exception as e:
+                print(f"⚠️ Ignoring unreadable embedding cache: {e}")
+        
+        # Encode only the texts that are not cached yet
+        missing = [i for i, key in enumerate(keys) if key not in cached]
+        if missing:
+            print(f"🔄 Encoding {len(missing)} new case studies ({len(keys) - len(missing)} cached)")
+            # sentence-transformers already length-sorts inputs before batching,
+            # so large batches carry little padding waste
+            new_embeddings = self.embedding_model.encode(
+                [texts[i] for i in missing],
+                batch_size=128,
+                convert_to_numpy=True,
+                normalize_embeddings=True,
+                show_progress_bar=False
             )
+            for i, embedding in zip(missing, new_embeddings):
+                cached[keys[i]] = embedding
+        else:
+            print(f"✅ Loaded all {len(keys)} embeddings from cache")
         
-        # Extract project data from MCP payload
-        project_data = project_mcp["payload"]
+        embeddings = np.stack([cached[key] for key in keys]).astype(np.float32, copy=False)
         
-        # Create query text from project details
+        # Persist only the current corpus so stale rows don't accumulate
+        if missing:
+            try:
+                np.savez(self.embedding_cache_path, keys=np.array(keys), embeddings=embeddings)
+            except OSError as e:
+                print(f"⚠️ Could not write embedding cache: {e}")
+        
+        return embeddings
+    
+    def _encode_queries(self, query_texts: List[str]) -> np.ndarray:
+        """
+        Encode and L2-normalize a batch of query strings.
+        
+        Uses the int8 ONNX encoder when available, otherwise sentence-transformers.
+        
+        Returns:
+            float32 array of shape (len(query_texts), dim)
+        """
+        if self.query_encoder is not None:
+            return self.query_encoder.encode(query_texts)
+        
+        return self.embedding_model.encode(
+            query_texts,
+            batch_size=64,
+            convert_to_numpy=True,
+            normalize_embeddings=True,
+            show_progress_bar=False
+        ).astype(np.float32, copy=False)
+    
+    def _encode_query_uncached(self, query_text: str) -> np.ndarray:
+        """
+        Encode and L2-normalize a single query string.
+        
+        Wrapped with an LRU cache in __init__; the returned array is shared
+        between cache hits and must not be modified in place.
+        """
+        return self._encode_queries([query_text])
+    
+    def _build_query_text(self, project_data: Dict) -> str:
+        """Combine project details into the text used for similarity search."""
         query_components = [
             project_data.get("project_type", ""),
             project_data.get("industry", ""),
@@ -127,24 +336,62 @@ class CaseStudyAgent:
             project_data.get("complexity", ""),
             " ".join(project_data.get("additional_services", []))
         ]
-        query_text = " ".join(filter(None, query_components))  # Remove empty strings
+        return " ".join(filter(None, query_components))  # Remove empty strings
+    
+    def _search_uncached(self, query_text: str, k: int):
+        """
+        Embed the query and search the FAISS index.
         
-        print(f"🔍 Searching for cases similar to: '{query_text[:100]}...'")
+        Wrapped with an LRU cache as self._search, so a repeated query string is
+        answered without touching the encoder or the index. On the HNSW and
+        IVF-PQ tiers, queries whose embedding nearly matches an earlier one
+        (cosine >= 0.95, same k) reuse that search result from the semantic
+        cache. PyTorch/ONNX Runtime and FAISS release the GIL while they run,
+        so this can execute on a worker thread alongside other agents.
+        
+        Returns:
+            Tuple of (scores, indices), each a 1-row tuple of k values
+        """
+        
+        # Generate normalized query embedding (memoized per query string)
+        query_embedding = self._encode_query(query_text)
         
-        # Generate query embedding
-        query_embedding = self.embedding_model.encode([query_text])
-        faiss.normalize_L2(query_embedding)
+        # Reuse results of a near-identical earlier query (large corpora only)
+        cached = self.semantic_cache.lookup(query_embedding, k) if self.semantic_cache is not None else None
+        if cached is not None:
+            print("✅ Using semantically cached case study search")
+            scores, indices = cached[0][None, :], cached[1][None, :]
+        else:
+            # Search for similar case studies
+            if hasattr(self.index, "nprobe"):
+                self.index.nprobe = self.nprobe
+            scores, indices = self.index.search(query_embedding, k)
+            if self.semantic_cache is not None:
+                self.semantic_cache.put(query_embedding, scores[0], indices[0])
         
-        # Search for similar case studies
-        scores, indices = self.index.search(query_embedding.astype('float32'), k)
+        # Immutable, hashable-friendly shape for the cache
+        return tuple(map(tuple, scores.tolist())), tuple(map(tuple, indices.tolist()))
+    
+    def _save_semantic_cache(self):
+        """Persist the semantic cache (registered with atexit)."""
+        if self.semantic_cache is None or len(self.semantic_cache) == 0:
+            return
+        try:
+            self.semantic_cache.save(self.semantic_cache_path)
+        except OSError as e:
+            print(f"⚠️ Could not write semantic cache: {e}")
+    
+    def _cases_mcp(self, scores, indices) -> Dict:
+        """Turn one row of FAISS search results into a CASE_STUDIES_RETRIEVED message."""
         
-        # Retrieve relevant case studies with similarity scores
-        relevant_cases = []
-        for i, idx in enumerate(indices[0]):
-            if idx != -1:  # Valid index
-                case = self.case_studies[idx].copy()
-                case['similarity_score'] = float(scores[0][i])
-                relevant_cases.append(case)
+        # Retrieve relevant case studies with similarity scores. Each hit is a
+        # read-through view over the stored case (no per-hit dict copy);
+        # callers that need a plain dict can call dict() on it.
+        relevant_cases = [
+            ChainMap({"similarity_score": float(scores[0][i])}, self.case_studies[idx])
+            for i, idx in enumerate(indices[0])
+            if idx != -1  # Valid index
+        ]
         
         print(f"✅ Found {len(relevant_cases)} relevant case studies")
         for i, case in enumerate(relevant_cases):
@@ -157,3 +404,108 @@ class CaseStudyAgent:
             msg_type="CASE_STUDIES_RETRIEVED",
             payload={"relevant_cases": relevant_cases}
         )
+    
+    def _empty_cases_mcp(self) -> Dict:
+        """MCP message returned when no index is available."""
+        print("⚠️ No case studies available for retrieval")
+        return create_mcp(
+            sender="CaseStudyAgent",
+            receiver="Orchestrator",
+            msg_type="CASE_STUDIES_RETRIEVED",
+            payload={"relevant_cases": []}
+        )
+    
+    def retrieve_relevant_cases(self, project_mcp: Dict, k: int = 3) -> Dict:
+        """
+        Retrieve most relevant case studies for the project.
+        
+        Key concepts:
+        1. Query text construction from project details
+        2. Query embedding generation
+        3. FAISS similarity search
+        4. Result ranking and filtering
+        5. Structured response creation
+        
+        Args:
+            project_mcp: MCP message with project details
+            k: Number of case studies to retrieve
+            
+        Returns:
+            MCP message with relevant case studies
+        """
+        
+        # Check if index is available
+        if self.index is None or len(self.case_studies) == 0:
+            return self._empty_cases_mcp()
+        
+        # Create query text from project details
+        query_text = self._build_query_text(project_mcp["payload"])
+        
+        print(f"🔍 Searching for cases similar to: '{query_text[:100]}...'")
+        
+        scores, indices = self._search(query_text, k)
+        return self._cases_mcp(scores, indices)
+    
+    async def retrieve_relevant_cases_async(self, project_mcp: Dict, k: int = 3) -> Dict:
+        """
+        Async variant of retrieve_relevant_cases.
+        
+        Encoding and search run on the agent's thread pool so the event loop
+        (and other agents) can make progress while the model is busy.
+        
+        Args:
+            project_mcp: MCP message with project details
+            k: Number of case studies to retrieve
+            
+        Returns:
+            MCP message with relevant case studies
+        """
+        
+        if self.index is None or len(self.case_studies) == 0:
+            return self._empty_cases_mcp()
+        
+        query_text = self._build_query_text(project_mcp["payload"])
+        
+        print(f"🔍 Searching for cases similar to: '{query_text[:100]}...'")
+        
+        loop = asyncio.get_running_loop()
+        scores, indices = await loop.run_in_executor(self._exec, self._search, query_text, k)
+        return self._cases_mcp(scores, indices)
+    
+    def retrieve_relevant_cases_batch(self, project_mcps: List[Dict], k: int = 3) -> List[Dict]:
+        """
+        Retrieve relevant case studies for several projects at once.
+        
+        Key concepts:
+        1. One batched encoder call for all query texts
+        2. One FAISS search over the (N, dim) query matrix (GEMM instead of N GEMVs)
+        3. Per-query MCP responses, in input order
+        
+        Args:
+            project_mcps: MCP messages with project details
+            k: Number of case studies to retrieve per project
+            
+        Returns:
+            List of MCP messages with relevant case studies
+        """
+        
+        if not project_mcps:
+            return []
+        
+        if self.index is None or len(self.case_studies) == 0:
+            return [self._empty_cases_mcp() for _ in project_mcps]
+        
+        query_texts = [self._build_query_text(mcp["payload"]) for mcp in project_mcps]
+        
+        print(f"🔍 Searching for cases similar to {len(query_texts)} projects in one batch")
+        
+        # Encode all queries together, then search the whole batch in one call
+        query_embeddings = self._encode_queries(query_texts)
+        if hasattr(self.index, "nprobe"):
+            self.index.nprobe = self.nprobe
+        scores, indices = self.index.search(query_embeddings, k)
+        
+        return [
+            self._cases_mcp(scores[row:row + 1], indices[row:row + 1])
+            for row in range(len(query_texts))
+        ]
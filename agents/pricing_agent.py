@@ -1,6 +1,7 @@
 # agents/pricing_agent.py - Calculates Project Pricing
 
 import json
+import numpy as np
 from typing import Dict, Any
 from utils.mcp import create_mcp
 
@@ -31,6 +32,22 @@ class PricingAgent:
         except FileNotFoundError:
             print(f"Warning: Pricing rules file not found at {pricing_rules_path}")
             self.pricing_rules = {}
+        
+        # Flatten rules into direct-lookup tables for the request path
+        self._base = {
+            (project_type, complexity): price
+            for project_type, prices in self.pricing_rules.get("base_pricing", {}).items()
+            for complexity, price in prices.items()
+        }
+        timeline_rules = self.pricing_rules.get("timeline_multipliers", {})
+        self._tm = [timeline_rules.get(str(week), 1.0) for week in range(0, 53)]
+        
+        # Service codebook: name -> index into a contiguous cost array. The
+        # trailing sentinel slot costs 0 and absorbs unknown service names.
+        service_costs = self.pricing_rules.get("additional_services", {})
+        self._svc_idx = {name: i for i, name in enumerate(service_costs)}
+        self._svc_unknown = len(service_costs)
+        self._svc_costs = np.array(list(service_costs.values()) + [0])
     
     def calculate_pricing(self, project_mcp: Dict) -> Dict:
         """
@@ -74,15 +91,18 @@ class PricingAgent:
         projects_completed_before = project_data.get("projects_completed_before", 0)
         
         # Get base price from pricing rules
-        base_price = self.pricing_rules["base_pricing"][project_type][complexity]
+        base_price = self._base[(project_type, complexity)]
         
-        # Apply timeline multiplier
-        timeline_multiplier = self.pricing_rules["timeline_multipliers"].get(str(timeline_weeks), 1.0)
+        # Apply timeline multiplier (weeks outside the table have no multiplier;
+        # bools are not week counts, so True does not index week 1)
+        if type(timeline_weeks) is int and 0 <= timeline_weeks < len(self._tm):
+            timeline_multiplier = self._tm[timeline_weeks]
+        else:
+            timeline_multiplier = self.pricing_rules.get("timeline_multipliers", {}).get(str(timeline_weeks), 1.0)
         
         # Calculate additional services cost
-        additional_cost = 0                
-        for service in additional_services:
-            additional_cost += self.pricing_rules["additional_services"].get(service, 0)
+        service_idx = [self._svc_idx.get(service, self._svc_unknown) for service in additional_services]
+        additional_cost = self._svc_costs[service_idx].sum().item()
         
         # Calculate base subtotal (before client-specific adjustments)
         base_subtotal = (base_price * timeline_multiplier) + additional_cost
@@ -1,11 +1,14 @@
 # agents/template_agent.py - Generates Final PDF from Template
 
-from jinja2 import Template
-import weasyprint
-from io import BytesIO
+import os
+from jinja2 import Environment, FileSystemLoader, FileSystemBytecodeCache, TemplateNotFound
+from weasyprint import HTML as WeasyHTML
+from weasyprint.text.fonts import FontConfiguration
 from typing import Dict
 from utils.mcp import create_mcp
 
+COMPANY_NAME = "Creative Agency Pro"
+
 class TemplateAgent:
     """
     Agent responsible for generating final PDF proposal from template.
@@ -17,20 +20,37 @@ class TemplateAgent:
     4. Binary data handling for PDF output
     """
     
-    def __init__(self, template_path: str = "data/templates/proposal_template.html"):
+    def __init__(self, template_path: str = "data/templates/proposal_template.html",
+                 bytecode_cache_dir: str = ".jinja_cache"):
         """
         Initialize template agent with HTML template.
         
-        TODO: Load HTML template file and create Jinja2 Template object
+        Templates are loaded through a Jinja2 Environment with a filesystem
+        bytecode cache, so restarts skip parsing/compiling unchanged templates.
+        
+        Args:
+            template_path: Path to the HTML proposal template
+            bytecode_cache_dir: Directory for compiled template bytecode
         """
         
+        os.makedirs(bytecode_cache_dir, exist_ok=True)
+        self.env = Environment(
+            loader=FileSystemLoader(os.path.dirname(template_path) or "."),
+            bytecode_cache=FileSystemBytecodeCache(directory=bytecode_cache_dir),
+            autoescape=True
+        )
+        
+        # Values that never change between proposals are bound once as globals
+        self.env.globals.update(company_name=COMPANY_NAME)
+        
         try:
-            with open(template_path, 'r', encoding='utf-8') as f:
-                template_content = f.read()
-            self.template = Template(template_content)
-        except FileNotFoundError:
+            self.template = self.env.get_template(os.path.basename(template_path))
+        except TemplateNotFound:
             print(f"Warning: Template file not found at {template_path}")
-            self.template = Template("<html><body><h1>Error: Template not found</h1></body></html>")
+            self.template = self.env.from_string("<html><body><h1>Error: Template not found</h1></body></html>")
+        
+        # Reuse one font configuration so system fonts are only scanned once
+        self._font_config = FontConfiguration()
     
     def generate_pdf_proposal(self, combined_data_mcp: Dict) -> Dict:
         """
@@ -59,35 +79,28 @@ class TemplateAgent:
             sections=data.get("sections", {}),
             pricing=data.get("pricing", {}),
             case_studies=data.get("relevant_cases", []),
-            company_name="Creative Agency Pro",
             date=data.get("date", ""),
             timeline_weeks=data.get("timeline_weeks", 4)
         )
         
-        # Create PDF buffer
-        pdf_buffer = BytesIO()
         pdf_bytes = None
         
         # Try to generate PDF from HTML
         try:
-            # Import WeasyPrint specifically to avoid conflicts
-            from weasyprint import HTML as WeasyHTML, CSS
-            
             # Create WeasyPrint HTML document
             html_doc = WeasyHTML(string=html_content)
             
-            # Write PDF to buffer
-            html_doc.write_pdf(pdf_buffer)
-            
-            # Extract PDF bytes
-            pdf_bytes = pdf_buffer.getvalue()
+            # Render straight to bytes (target=None) using the shared font configuration
+            pdf_bytes = html_doc.write_pdf(
+                target=None,
+                font_config=self._font_config,
+                presentational_hints=True,
+                optimize_images=True,
+                jpeg_quality=80
+            )
             
             print(f"✅ PDF generated successfully: {len(pdf_bytes)} bytes")
             
-        except ImportError as e:
-            print(f"Warning: WeasyPrint not installed properly: {e}")
-            print("Install with: pip install weasyprint")
-            
         except Exception as e:
             print(f"PDF generation error: {e}")
             print(f"Error type: {type(e)}")
@@ -116,3 +129,25 @@ class TemplateAgent:
                     "note": "PDF generation unavailable - HTML output provided"
                 }
             )
+
+# Per-process agent used by render_pdf_in_worker (built on first use in each worker)
+_worker_agent = None
+
+def render_pdf_in_worker(combined_data_mcp: Dict) -> Dict:
+    """
+    Process-pool entry point for PDF generation.
+    
+    Each worker process builds its own TemplateAgent once and reuses it, so
+    the compiled template and font configuration are loaded once per worker rather
+    than per proposal. Must stay a module-level function so it can be pickled.
+    
+    Args:
+        combined_data_mcp: Picklable MCP message with all aggregated data
+        
+    Returns:
+        MCP message with PDF bytes and HTML content
+    """
+    global _worker_agent
+    if _worker_agent is None:
+        _worker_agent = TemplateAgent()
+    return _worker_agent.generate_pdf_proposal(combined_data_mcp)
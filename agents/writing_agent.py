@@ -1,10 +1,23 @@
 # agents/writing_agent.py - Generates Proposal Text Using LLM
 
-from transformers import pipeline
-from langchain.llms import HuggingFacePipeline
+import re
+import json
+import hashlib
+import torch
+from diskcache import Cache
+from transformers import AutoModelForSeq2SeqLM, AutoTokenizer, BitsAndBytesConfig, GenerationConfig
 from langchain.prompts import PromptTemplate
 from utils.mcp import create_mcp
-from typing import Dict
+from utils.batch_llm import BatchLLMClient
+from typing import Dict, List
+
+MODEL_NAME = "google/flan-t5-base"
+
+# Generated sections expire from the disk cache after a week
+SECTIONS_CACHE_TTL_SECONDS = 7 * 24 * 3600
+
+# Sentence boundaries: whitespace following '.', '!' or '?'
+_SENTENCE_SPLIT_RE = re.compile(r'(?<=[.!?])\s+')
 
 class WritingAgent:
     """
@@ -12,24 +25,28 @@ class WritingAgent:
     
     Key concepts to implement:
     1. Local LLM integration (FLAN-T5)
-    2. LangChain pipeline setup
+    2. Batched tokenization and generation
     3. Prompt template design
     4. Multi-section text generation
     5. Structured output creation
     """
     
-    def __init__(self):
+    def __init__(self, cache_dir: str = "data/.writing_cache"):
         """
         Initialize writing agent with LLM and prompt templates.
         
         TODO: Set up the following:
-        1. Transformers pipeline with FLAN-T5
-        2. LangChain HuggingFacePipeline wrapper
-        3. PromptTemplate objects for different sections
+        1. FLAN-T5 model, tokenizer and reusable generation config
+        2. PromptTemplate objects for different sections
+        
+        Args:
+            cache_dir: Directory of the persistent generated-sections cache
         """
         
+        # Generated sections keyed by a hash of the prompt inputs
+        self.cache = Cache(cache_dir)
+        
         # Detect available device (GPU or CPU)
-        import torch
         if torch.cuda.is_available():
             device = 0  # Use GPU
             device_name = f"GPU ({torch.cuda.get_device_name(0)})"
@@ -39,33 +56,36 @@ class WritingAgent:
         
         print(f"🔧 Initializing Writing Agent on {device_name}")
         
-        # Initialize LLM components with automatic device detection
-        self.generator = pipeline(
-            "text2text-generation",
-            model="google/flan-t5-base",
+        # Load int8-quantized model weights for the detected device
+        self.tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME)
+        self.model, placed_by_accelerate = self._load_int8_model(use_gpu=device >= 0)
+        
+        # Models dispatched with device_map are already on their device
+        if placed_by_accelerate:
+            self.device = self.model.device
+        else:
+            self.device = torch.device("cuda", device) if device >= 0 else torch.device("cpu")
+            self.model.to(self.device)
+        self.model.eval()
+        
+        # Built once and reused for every generate() call
+        self.gen_config = GenerationConfig(
             max_length=300,  # Reduced to prevent repetition
             min_length=50,   # Ensure minimum content
             do_sample=True,  # Enable sampling for diversity
             temperature=0.7, # Add some creativity
             top_p=0.9,       # Nucleus sampling
             repetition_penalty=1.2,  # Penalize repetition
-            device=device
+            pad_token_id=self.tokenizer.pad_token_id,
+            decoder_start_token_id=self.model.config.decoder_start_token_id,
+            eos_token_id=self.tokenizer.eos_token_id
         )
         
         print(f"✅ Model loaded on {device_name}")
         
-        self.llm = HuggingFacePipeline(
-            pipeline=self.generator,
-            model_kwargs={
-                "max_length": 300,
-                "min_length": 50,
-                "do_sample": True,
-                "temperature": 0.7,
-                "top_p": 0.9,
-                "repetition_penalty": 1.2,
-                "pad_token_id": self.generator.tokenizer.eos_token_id
-            }
-        )
+        # All generation goes through one batcher, so prompts from concurrent
+        # proposals share generate() calls and never hit the model in parallel
+        self.llm = BatchLLMClient(self._generate_batch)
         
         self.section_prompts = {
             "executive_summary": PromptTemplate(
@@ -107,19 +127,90 @@ Methodology:"""
             )
         }
     
-    def generate_proposal_sections(self, project_mcp: Dict) -> Dict:
+    def _load_int8_model(self, use_gpu: bool):
+        """
+        Load FLAN-T5 with int8 weights, falling back to full precision.
+        
+        Key concepts:
+        1. GPU: bitsandbytes 8-bit weights dispatched via accelerate (device_map="auto")
+        2. CPU: PyTorch dynamic quantization of Linear layers (int8 GEMM via fbgemm)
+        3. Graceful fallback when the quantization backend is unavailable
+        
+        Args:
+            use_gpu: Whether a CUDA device is available
+            
+        Returns:
+            Tuple of (model, placed_by_accelerate)
+        """
+        
+        if use_gpu:
+            try:
+                model = AutoModelForSeq2SeqLM.from_pretrained(
+                    MODEL_NAME,
+                    quantization_config=BitsAndBytesConfig(load_in_8bit=True),
+                    device_map="auto"
+                )
+                print("✅ Loaded int8 weights with bitsandbytes")
+                return model, True
+            except ImportError as e:
+                print(f"Warning: 8-bit loading unavailable ({e}), using full precision")
+                print("Install with: pip install bitsandbytes accelerate")
+                return AutoModelForSeq2SeqLM.from_pretrained(MODEL_NAME), False
+            except Exception as e:
+                # e.g. no compatible CUDA build of bitsandbytes, or an unsupported GPU
+                print(f"Warning: 8-bit loading failed ({e}), using full precision")
+                return AutoModelForSeq2SeqLM.from_pretrained(MODEL_NAME), False
+        
+        model = AutoModelForSeq2SeqLM.from_pretrained(MODEL_NAME)
+        try:
+            model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+            print("✅ Applied dynamic int8 quantization for CPU")
+        except Exception as e:
+            print(f"Warning: Dynamic quantization failed ({e}), using full precision")
+        return model, False
+    
+    def _generate_batch(self, prompts: List[str]) -> List[str]:
+        """
+        Generate completions for a batch of prompts in one generate() call.
+        
+        Key concepts:
+        1. Pad to the longest prompt in the batch
+        2. Pinned host memory + non-blocking copy to the GPU
+        3. Reused GenerationConfig (no per-call construction)
+        
+        Args:
+            prompts: Fully formatted prompts
+            
+        Returns:
+            Decoded completions, in prompt order
+        """
+        
+        inputs = self.tokenizer(prompts, return_tensors="pt", padding="longest")
+        if self.device.type == "cuda":
+            inputs = {name: tensor.pin_memory().to(self.device, non_blocking=True) for name, tensor in inputs.items()}
+        else:
+            inputs = {name: tensor.to(self.device) for name, tensor in inputs.items()}
+        
+        with torch.inference_mode():
+            output_ids = self.model.generate(**inputs, generation_config=self.gen_config)
+        
+        return self.tokenizer.batch_decode(output_ids, skip_special_tokens=True)
+    
+    def generate_proposal_sections(self, project_mcp: Dict, bypass_cache: bool = False) -> Dict:
         """
         Generate all proposal text sections.
         
         Key concepts:
         1. Extract project details from MCP
         2. Use prompt templates to format inputs
-        3. Call LLM for each section (executive_summary, project_overview, methodology)
-        4. Collect all generated sections
-        5. Return structured MCP response
+        3. Return cached sections for previously seen prompts
+        4. Submit all section prompts to the shared LLM batcher
+        5. Collect all generated sections
+        6. Return structured MCP response
         
         Args:
             project_mcp: MCP message with project details
+            bypass_cache: Regenerate even if cached sections exist
             
         Returns:
             MCP message with generated text sections
@@ -144,44 +235,52 @@ Methodology:"""
         sections = {}
         
         try:
-            # Generate executive summary
-            print("🔤 Generating executive summary...")
-            exec_prompt = self.section_prompts["executive_summary"].format(
-                client_name=client_name,
-                project_title=project_title,
-                project_description=project_description,
-                timeline_months=timeline_months,
-                key_benefits=key_benefits
-            )
-            exec_result = self.llm(exec_prompt).strip()
-            sections["executive_summary"] = self._clean_generated_text(exec_result)
+            # Format one prompt per section
+            section_inputs = {
+                "executive_summary": self.section_prompts["executive_summary"].format(
+                    client_name=client_name,
+                    project_title=project_title,
+                    project_description=project_description,
+                    timeline_months=timeline_months,
+                    key_benefits=key_benefits
+                ),
+                "project_overview": self.section_prompts["project_overview"].format(
+                    client_name=client_name,
+                    project_title=project_title,
+                    project_description=project_description,
+                    requirements=requirements,
+                    timeline_months=timeline_months,
+                    technologies=technologies
+                ),
+                "methodology": self.section_prompts["methodology"].format(
+                    project_title=project_title,
+                    project_description=project_description,
+                    technologies=technologies,
+                    client_type=client_type.replace("_", " ").title()
+                )
+            }
             
-            # Generate project overview
-            print("🔤 Generating project overview...")
-            overview_prompt = self.section_prompts["project_overview"].format(
-                client_name=client_name,
-                project_title=project_title,
-                project_description=project_description,
-                requirements=requirements,
-                timeline_months=timeline_months,
-                technologies=technologies
-            )
-            overview_result = self.llm(overview_prompt).strip()
-            sections["project_overview"] = self._clean_generated_text(overview_result)
+            # Look up previously generated sections for identical prompts and
+            # sampling settings (editing a template or the config misses)
+            cache_key = self._cache_key(section_inputs)
+            if not bypass_cache:
+                cached_sections = self.cache.get(cache_key)
+                if cached_sections is not None:
+                    print("✅ Using cached proposal sections")
+                    return self._sections_mcp(cached_sections)
             
-            # Generate methodology
-            print("🔤 Generating methodology...")
-            methodology_prompt = self.section_prompts["methodology"].format(
-                project_title=project_title,
-                project_description=project_description,
-                technologies=technologies,
-                client_type=client_type.replace("_", " ").title()
-            )
-            methodology_result = self.llm(methodology_prompt).strip()
-            sections["methodology"] = self._clean_generated_text(methodology_result)
+            # Generate all sections together (batched with any concurrent requests)
+            print(f"🔤 Generating {len(section_inputs)} sections in one batch...")
+            outputs = self.llm.generate(list(section_inputs.values()))
+            
+            for section_name, output in zip(section_inputs, outputs):
+                sections[section_name] = self._clean_generated_text(output.strip())
             
             print(f"✅ Generated {len(sections)} sections successfully")
             
+            # Only real LLM output is cached; fallback text below is not
+            self.cache.set(cache_key, sections, expire=SECTIONS_CACHE_TTL_SECONDS)
+            
         except Exception as e:
             print(f"❌ Error generating sections: {e}")
             # Provide fallback content
@@ -192,6 +291,19 @@ Methodology:"""
             }
         
         # Return MCP message with generated sections
+        return self._sections_mcp(sections)
+    
+    def _cache_key(self, prompts: Dict[str, str]) -> str:
+        """SHA-256 of the model name, formatted section prompts and generation config."""
+        canonical = json.dumps({
+            "model": MODEL_NAME,
+            "prompts": prompts,
+            "generation_config": self.gen_config.to_json_string()
+        }, sort_keys=True)
+        return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+    
+    def _sections_mcp(self, sections: Dict) -> Dict:
+        """Wrap generated sections in a PROPOSAL_SECTIONS_GENERATED message."""
         return create_mcp(
             sender="WritingAgent",
             receiver="Orchestrator",
@@ -209,22 +321,26 @@ Methodology:"""
         Returns:
             Cleaned and formatted text
         """
-        # Remove excessive repetition
-        sentences = text.split('. ')
+        # Remove excessive repetition in a single pass, remembering only the
+        # hash of each normalized sentence
         unique_sentences = []
-        seen_sentences = set()
+        seen_hashes = set()
         
-        for sentence in sentences:
+        for sentence in _SENTENCE_SPLIT_RE.split(text):
             sentence = sentence.strip()
-            if sentence and sentence.lower() not in seen_sentences:
-                unique_sentences.append(sentence)
-                seen_sentences.add(sentence.lower())
+            if not sentence:
+                continue
+            sentence_hash = hash(sentence.rstrip('.!?').lower())
+            if sentence_hash in seen_hashes:
+                continue
+            seen_hashes.add(sentence_hash)
+            unique_sentences.append(sentence)
         
-        # Rejoin sentences
-        cleaned_text = '. '.join(unique_sentences)
+        # Rejoin sentences (each keeps its own terminal punctuation)
+        cleaned_text = ' '.join(unique_sentences)
         
         # Ensure proper ending
-        if cleaned_text and not cleaned_text.endswith('.'):
+        if cleaned_text and not cleaned_text.endswith(('.', '!', '?')):
             cleaned_text += '.'
         
         # Limit length if too long
@@ -37,84 +37,167 @@ Learning Concepts:
 """
 
 import streamlit as st
-import json
+import re
+import asyncio
 import tempfile
 import os
+import atexit
+import time
+import logging
 from typing import Dict, List, Optional
 from datetime import datetime, timedelta
+from utils.mcp import dumps as mcp_dumps, dumps_bytes as mcp_dumps_bytes
 
-# Import our orchestrator
-from orchestrator import ProposalOrchestrator
+# PDF worker processes re-import this script as __mp_main__ (multiprocessing
+# restores the parent's main module); they only need its definitions, not the
+# page and logging setup below
+_IS_PDF_WORKER = __name__ == "__mp_main__"
 
-# Page configuration
-st.set_page_config(
-    page_title="Automated Proposal & Pricing Agent",
-    page_icon="📊",
-    layout="wide",
-    initial_sidebar_state="expanded"
-)
+if not _IS_PDF_WORKER:
+    # Orchestrator progress is logged at INFO on its own handler; the root
+    # logger is left alone so third-party INFO chatter stays hidden. The
+    # handler check keeps reruns from stacking duplicate handlers.
+    _orchestrator_log = logging.getLogger("orchestrator")
+    _orchestrator_log.setLevel(logging.INFO)
+    if not _orchestrator_log.handlers:
+        _handler = logging.StreamHandler()
+        _handler.setFormatter(logging.Formatter("%(asctime)s %(name)s %(message)s"))
+        _orchestrator_log.addHandler(_handler)
+        _orchestrator_log.propagate = False
+    
+    # Page configuration
+    st.set_page_config(
+        page_title="Automated Proposal & Pricing Agent",
+        page_icon="📊",
+        layout="wide",
+        initial_sidebar_state="expanded"
+    )
+
+# Partial reruns: st.fragment (Streamlit >= 1.37) or st.experimental_fragment
+# (>= 1.33). On older versions this is a no-op and widgets rerun the full script.
+_fragment = getattr(st, "fragment", None) or getattr(st, "experimental_fragment", None) or (lambda func: func)
 
 # Custom CSS for better styling
-st.markdown("""
-<style>
-.main-title {
-    text-align: center;
-    color: #1f77b4;
-    font-size: 2.5rem;
-    margin-bottom: 2rem;
-}
-.section-header {
-    color: #2e86c1;
-    font-size: 1.5rem;
-    margin: 1rem 0;
-    border-bottom: 2px solid #2e86c1;
-    padding-bottom: 0.5rem;
-}
-.success-box {
-    padding: 1rem;
-    background-color: #d4edda;
-    border: 1px solid #c3e6cb;
-    border-radius: 0.5rem;
-    margin: 1rem 0;
-}
-.error-box {
-    padding: 1rem;
-    background-color: #f8d7da;
-    border: 1px solid #f5c6cb;
-    border-radius: 0.5rem;
-    margin: 1rem 0;
-}
-</style>
-""", unsafe_allow_html=True)
+CSS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets", "styles.css")
+
+@st.cache_data(show_spinner=False)
+def _load_css() -> str:
+    """Read the app stylesheet once; reruns reuse the cached string."""
+    with open(CSS_PATH, 'r', encoding='utf-8') as f:
+        return f.read()
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def _payload_json(payload_id: str, _payload: Dict) -> bytes:
+    """
+    Serialize a proposal payload for the raw-data download, once per proposal.
+    
+    Streamlit hashes only payload_id (underscore-prefixed args are skipped), so
+    reruns reuse the cached bytes instead of re-serializing the payload.
+    """
+    return mcp_dumps_bytes(_payload, indent=True)
+
+# Spooled PDFs older than this are deleted even if their session is still
+# open (the download tab then falls back to the HTML version)
+TEMP_PDF_MAX_AGE_HOURS = 6
+
+def _cleanup_temp_pdfs(paths: set):
+    """Delete all spooled proposal PDFs."""
+    for path in list(paths):
+        _remove_temp_pdf(path, paths)
+
+@st.cache_resource
+def _temp_pdf_registry() -> set:
+    """
+    Process-wide set of spooled PDF paths, deleted at interpreter exit.
+    
+    Cached as a resource so script reruns share one set and register the
+    atexit hook only once.
+    """
+    paths = set()
+    atexit.register(_cleanup_temp_pdfs, paths)
+    return paths
+
+def _remove_temp_pdf(path: Optional[str], paths: Optional[set] = None):
+    """Delete one spooled proposal PDF, ignoring files that are already gone."""
+    if not path:
+        return
+    (paths if paths is not None else _temp_pdf_registry()).discard(path)
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+def _expire_temp_pdfs(paths: set):
+    """Delete spooled PDFs older than TEMP_PDF_MAX_AGE_HOURS (and forget ones already gone)."""
+    cutoff = time.time() - TEMP_PDF_MAX_AGE_HOURS * 3600
+    for path in list(paths):
+        try:
+            expired = os.path.getmtime(path) < cutoff
+        except OSError:
+            expired = True
+        if expired:
+            _remove_temp_pdf(path, paths)
+
+def _spool_pdf_to_disk(proposal_result: Dict) -> Dict:
+    """
+    Move generated PDF bytes out of the result and into a temp file.
+    
+    Only the file path is kept in the payload, so the (potentially multi-MB)
+    PDF does not live in session state for the whole session. Sessions that
+    end without clearing their proposal leave their file behind, so files
+    older than TEMP_PDF_MAX_AGE_HOURS are removed on each spool.
+    """
+    payload = proposal_result.get('payload', {})
+    pdf_bytes = payload.pop('pdf_bytes', None)
+    if pdf_bytes:
+        _expire_temp_pdfs(_temp_pdf_registry())
+        with tempfile.NamedTemporaryFile(delete=False, prefix="proposal_", suffix=".pdf") as f:
+            f.write(pdf_bytes)
+        _temp_pdf_registry().add(f.name)
+        payload['pdf_path'] = f.name
+    return proposal_result
 
 def initialize_session_state():
     """Initialize Streamlit session state variables."""
-    if 'orchestrator' not in st.session_state:
-        st.session_state.orchestrator = None
-    
     if 'proposal_generated' not in st.session_state:
         st.session_state.proposal_generated = False
     
     if 'proposal_data' not in st.session_state:
         st.session_state.proposal_data = None
     
-    if 'generation_history' not in st.session_state:
-        st.session_state.generation_history = []
+    # Generation history as parallel lists (struct-of-arrays), capped at HISTORY_LIMIT
+    for key in ('history_ts', 'history_client', 'history_title', 'history_ok'):
+        if key not in st.session_state:
+            st.session_state[key] = []
     
     if 'demo_data' not in st.session_state:
         st.session_state.demo_data = {}
 
-def load_orchestrator():
-    """Load and cache the orchestrator with all agents."""
-    if st.session_state.orchestrator is None:
-        with st.spinner("🤖 Initializing AI agents..."):
-            try:
-                st.session_state.orchestrator = ProposalOrchestrator()
-                st.success("✅ All agents initialized successfully!")
-            except Exception as e:
-                st.error(f"❌ Failed to initialize agents: {e}")
-                return False
-    return True
+def record_generation(client_name: str, project_title: str, success: bool):
+    """Append one generation to the session history, dropping the oldest beyond HISTORY_LIMIT."""
+    state = st.session_state
+    state.history_ts.append(time.time())
+    state.history_client.append(client_name)
+    state.history_title.append(project_title)
+    state.history_ok.append(success)
+    
+    overflow = len(state.history_ts) - HISTORY_LIMIT
+    if overflow > 0:
+        for key in ('history_ts', 'history_client', 'history_title', 'history_ok'):
+            del state[key][:overflow]
+
+@st.cache_resource(show_spinner="🤖 Initializing AI agents...")
+def get_orchestrator():
+    """
+    Build the ProposalOrchestrator once per process and share it across all sessions and reruns.
+    
+    The orchestrator module (LangChain, FAISS, transformers, torch) is imported
+    here rather than at module top, so page loads don't pay for it until the
+    agents are first needed. Failed initializations are not cached, so the next
+    rerun retries.
+    """
+    from orchestrator import ProposalOrchestrator
+    return ProposalOrchestrator()
 
 def render_sidebar():
     """Render the sidebar with optional demo loading and clear instructions."""
@@ -186,99 +269,126 @@ def render_sidebar():
     
     return None
 
-def load_demo_project() -> Dict:
-    """Load a comprehensive demo project for testing."""
-    return {
-        "client_name": "TechCorp Solutions",
-        "project_title": "Enterprise Digital Transformation Platform",
-        "project_description": "Design and develop a comprehensive digital transformation platform that integrates customer relationship management, inventory tracking, employee management, and advanced analytics. The platform will feature a modern responsive web interface, mobile applications for iOS and Android, real-time data visualization dashboards, automated reporting systems, and secure API integrations with existing enterprise systems. This solution aims to streamline business operations, improve decision-making through data insights, and enhance overall organizational efficiency.",
+# Maximum number of generation history entries kept per session
+HISTORY_LIMIT = 100
+
+# Form choices and their reverse index maps, built once at import
+_CLIENT_TYPES = ("startup", "small_business", "enterprise")
+_CLIENT_TYPE_INDEX = {value: i for i, value in enumerate(_CLIENT_TYPES)}
+
+_BUDGET_OPTIONS = (
+    "Under $10,000",
+    "$10,000 - $25,000",
+    "$25,000 - $50,000",
+    "$50,000 - $100,000",
+    "$100,000 - $250,000",
+    "Over $250,000"
+)
+_BUDGET_INDEX = {value: i for i, value in enumerate(_BUDGET_OPTIONS)}
+
+# One non-blank item per line / per comma, with surrounding whitespace excluded
+# from the match so no separate strip() pass is needed
+_REQ_RE = re.compile(r'\S(?:[^\n]*\S)?')
+_TECH_RE = re.compile(r'[^,\s](?:[^,]*[^,\s])?')
+
+# Static demo/example projects, built once at import
+_DEMO_PROJECT: Dict = {
+    "client_name": "TechCorp Solutions",
+    "project_title": "Enterprise Digital Transformation Platform",
+    "project_description": "Design and develop a comprehensive digital transformation platform that integrates customer relationship management, inventory tracking, employee management, and advanced analytics. The platform will feature a modern responsive web interface, mobile applications for iOS and Android, real-time data visualization dashboards, automated reporting systems, and secure API integrations with existing enterprise systems. This solution aims to streamline business operations, improve decision-making through data insights, and enhance overall organizational efficiency.",
+    "client_type": "enterprise",
+    "timeline_months": 8,
+    "budget_range": "$100,000 - $250,000",
+    "recurring_client": True,
+    "priority_client": False,
+    "requirements": [
+        "Responsive web application with modern UI/UX",
+        "Mobile applications for iOS and Android",
+        "Real-time analytics and reporting dashboard",
+        "Customer relationship management (CRM) module",
+        "Inventory management system",
+        "Employee management and HR integration",
+        "Secure API development and integrations",
+        "Data visualization and business intelligence",
+        "Multi-role user authentication and authorization",
+        "Automated email notifications and alerts",
+        "Cloud deployment with scalable infrastructure",
+        "Comprehensive testing and quality assurance"
+    ],
+    "target_technologies": [
+        "React.js", "TypeScript", "Node.js", "Express.js", 
+        "PostgreSQL", "Redis", "Docker", "AWS", 
+        "React Native", "GraphQL", "JWT Authentication",
+        "Chart.js", "Material-UI", "Jest", "Cypress"
+    ]
+}
+
+_EXAMPLES: Dict[str, Dict] = {
+    "ecommerce": {
+        "client_name": "TechStart Solutions",
+        "project_title": "E-commerce Platform Development",
+        "project_description": "Build a modern e-commerce platform with product catalog, shopping cart, payment integration, and admin dashboard. Requires mobile-responsive design and SEO optimization.",
+        "client_type": "startup",
+        "timeline_months": 4,
+        "budget_range": "$25,000 - $50,000",
+        "requirements": [
+            "Product catalog management",
+            "Shopping cart and checkout",
+            "Payment gateway integration",
+            "User authentication and profiles",
+            "Admin dashboard",
+            "Mobile responsive design",
+            "SEO optimization"
+        ],
+        "target_technologies": ["React", "Node.js", "MongoDB", "Stripe API"]
+    },
+    "enterprise": {
+        "client_name": "Global Manufacturing Corp",
+        "project_title": "Enterprise Resource Planning System",
+        "project_description": "Comprehensive ERP system for manufacturing operations including inventory management, supply chain tracking, financial reporting, and workforce management.",
         "client_type": "enterprise",
-        "timeline_months": 8,
+        "timeline_months": 12,
         "budget_range": "$100,000 - $250,000",
-        "recurring_client": True,
-        "priority_client": False,
         "requirements": [
-            "Responsive web application with modern UI/UX",
-            "Mobile applications for iOS and Android",
-            "Real-time analytics and reporting dashboard",
-            "Customer relationship management (CRM) module",
             "Inventory management system",
-            "Employee management and HR integration",
-            "Secure API development and integrations",
-            "Data visualization and business intelligence",
-            "Multi-role user authentication and authorization",
-            "Automated email notifications and alerts",
-            "Cloud deployment with scalable infrastructure",
-            "Comprehensive testing and quality assurance"
+            "Supply chain tracking",
+            "Financial reporting module",
+            "Workforce management",
+            "Real-time analytics dashboard",
+            "Multi-location support",
+            "Integration with existing systems"
         ],
-        "target_technologies": [
-            "React.js", "TypeScript", "Node.js", "Express.js", 
-            "PostgreSQL", "Redis", "Docker", "AWS", 
-            "React Native", "GraphQL", "JWT Authentication",
-            "Chart.js", "Material-UI", "Jest", "Cypress"
-        ]
+        "target_technologies": ["Java", "Spring Boot", "PostgreSQL", "Angular", "Microservices"]
+    },
+    "mobile": {
+        "client_name": "FitLife Wellness",
+        "project_title": "Fitness Tracking Mobile Application",
+        "project_description": "Cross-platform mobile app for fitness tracking with workout plans, nutrition logging, progress analytics, and social features for community engagement.",
+        "client_type": "small_business",
+        "timeline_months": 6,
+        "budget_range": "$40,000 - $80,000",
+        "requirements": [
+            "Cross-platform mobile app",
+            "Workout tracking and plans",
+            "Nutrition logging",
+            "Progress analytics",
+            "Social features",
+            "Wearable device integration",
+            "Offline functionality"
+        ],
+        "target_technologies": ["React Native", "Firebase", "TensorFlow Lite", "GraphQL"]
     }
+}
 
+@st.cache_data(show_spinner=False)
+def load_demo_project() -> Dict:
+    """Load a comprehensive demo project for testing."""
+    return _DEMO_PROJECT.copy()
+
+@st.cache_data(show_spinner=False)
 def load_example_project(project_type: str) -> Dict:
     """Load predefined example projects."""
-    examples = {
-        "ecommerce": {
-            "client_name": "TechStart Solutions",
-            "project_title": "E-commerce Platform Development",
-            "project_description": "Build a modern e-commerce platform with product catalog, shopping cart, payment integration, and admin dashboard. Requires mobile-responsive design and SEO optimization.",
-            "client_type": "startup",
-            "timeline_months": 4,
-            "budget_range": "$25,000 - $50,000",
-            "requirements": [
-                "Product catalog management",
-                "Shopping cart and checkout",
-                "Payment gateway integration",
-                "User authentication and profiles",
-                "Admin dashboard",
-                "Mobile responsive design",
-                "SEO optimization"
-            ],
-            "target_technologies": ["React", "Node.js", "MongoDB", "Stripe API"]
-        },
-        "enterprise": {
-            "client_name": "Global Manufacturing Corp",
-            "project_title": "Enterprise Resource Planning System",
-            "project_description": "Comprehensive ERP system for manufacturing operations including inventory management, supply chain tracking, financial reporting, and workforce management.",
-            "client_type": "enterprise",
-            "timeline_months": 12,
-            "budget_range": "$100,000 - $250,000",
-            "requirements": [
-                "Inventory management system",
-                "Supply chain tracking",
-                "Financial reporting module",
-                "Workforce management",
-                "Real-time analytics dashboard",
-                "Multi-location support",
-                "Integration with existing systems"
-            ],
-            "target_technologies": ["Java", "Spring Boot", "PostgreSQL", "Angular", "Microservices"]
-        },
-        "mobile": {
-            "client_name": "FitLife Wellness",
-            "project_title": "Fitness Tracking Mobile Application",
-            "project_description": "Cross-platform mobile app for fitness tracking with workout plans, nutrition logging, progress analytics, and social features for community engagement.",
-            "client_type": "small_business",
-            "timeline_months": 6,
-            "budget_range": "$40,000 - $80,000",
-            "requirements": [
-                "Cross-platform mobile app",
-                "Workout tracking and plans",
-                "Nutrition logging",
-                "Progress analytics",
-                "Social features",
-                "Wearable device integration",
-                "Offline functionality"
-            ],
-            "target_technologies": ["React Native", "Firebase", "TensorFlow Lite", "GraphQL"]
-        }
-    }
-    
-    return examples.get(project_type, {})
+    return _EXAMPLES.get(project_type, {}).copy()
 
 def render_project_form() -> Optional[Dict]:
     """Render the main project input form."""
@@ -307,8 +417,8 @@ def render_project_form() -> Optional[Dict]:
             
             client_type = st.selectbox(
                 "Client Type *",
-                ["startup", "small_business", "enterprise"],
-                index=["startup", "small_business", "enterprise"].index(demo_data.get("client_type", "startup")),
+                _CLIENT_TYPES,
+                index=_CLIENT_TYPE_INDEX.get(demo_data.get("client_type", "startup"), 0),
                 help="Affects pricing multipliers and approach"
             )
             
@@ -321,21 +431,10 @@ def render_project_form() -> Optional[Dict]:
             )
         
         with col2:
-            budget_options = [
-                "Under $10,000",
-                "$10,000 - $25,000", 
-                "$25,000 - $50,000",
-                "$50,000 - $100,000",
-                "$100,000 - $250,000",
-                "Over $250,000"
-            ]
-            default_budget = demo_data.get("budget_range", "$25,000 - $50,000")
-            budget_index = budget_options.index(default_budget) if default_budget in budget_options else 2
-            
             budget_range = st.selectbox(
                 "Budget Range *",
-                budget_options,
-                index=budget_index,
+                _BUDGET_OPTIONS,
+                index=_BUDGET_INDEX.get(demo_data.get("budget_range", "$25,000 - $50,000"), 2),
                 help="Expected budget range for the project"
             )
             
@@ -388,8 +487,8 @@ def render_project_form() -> Optional[Dict]:
                 return None
             
             # Process requirements and technologies
-            requirements = [req.strip() for req in requirements_text.split('\n') if req.strip()]
-            technologies = [tech.strip() for tech in technologies_text.split(',') if tech.strip()]
+            requirements = _REQ_RE.findall(requirements_text)
+            technologies = _TECH_RE.findall(technologies_text)
             
             # Build project data
             project_data = {
@@ -410,6 +509,44 @@ def render_project_form() -> Optional[Dict]:
     
     return None
 
+def make_partial_renderer():
+    """
+    Create preview placeholders and a callback that fills them as agents finish.
+    
+    The callback matches ProposalOrchestrator's on_node_complete signature, so
+    pricing, sections and case studies appear while slower agents (and the
+    PDF) are still running.
+    """
+    st.markdown("### ⏳ Early Results")
+    pricing_col, sections_col, cases_col = st.columns(3)
+    placeholders = {
+        "pricing": pricing_col.empty(),
+        "writing": sections_col.empty(),
+        "cases": cases_col.empty(),
+    }
+    
+    def render_partial(node_name: str, mcp: Dict):
+        placeholder = placeholders.get(node_name)
+        if placeholder is None:
+            return
+        payload = mcp["payload"]
+        
+        if node_name == "pricing":
+            placeholder.metric("Total Cost", f"${payload['pricing'].get('total', 0):,.2f}")
+        elif node_name == "writing":
+            with placeholder.container():
+                st.markdown("**📝 Sections**")
+                for section_name, content in payload['sections'].items():
+                    st.caption(f"**{section_name.replace('_', ' ').title()}:** {content[:150]}...")
+        elif node_name == "cases":
+            with placeholder.container():
+                st.markdown("**📚 Similar Projects**")
+                for case in payload['relevant_cases']:
+                    st.caption(f"{case['title']} ({case['similarity_score']:.2f})")
+    
+    return render_partial
+
+@_fragment
 def render_proposal_results(proposal_result: Dict):
     """Render the generated proposal results."""
     st.markdown('<h2 class="section-header">🎉 Proposal Generated Successfully!</h2>', unsafe_allow_html=True)
@@ -471,7 +608,8 @@ def render_proposal_results(proposal_result: Dict):
         pricing = payload.get('pricing', {})
         
         if pricing:
-            st.json(pricing)
+            with st.expander("Show raw pricing JSON", expanded=False):
+                st.json(pricing)
         else:
             st.warning("No pricing data available")
     
@@ -498,10 +636,14 @@ def render_proposal_results(proposal_result: Dict):
         st.markdown("### Download Options")
         
         # Check if we have PDF or HTML
-        if 'pdf_bytes' in payload:
+        pdf_path = payload.get('pdf_path')
+        if pdf_path and os.path.exists(pdf_path):
+            # Read from disk only here, where the download button needs the bytes
+            with open(pdf_path, 'rb') as f:
+                pdf_data = f.read()
             st.download_button(
                 label="📄 Download PDF Proposal",
-                data=payload['pdf_bytes'],
+                data=pdf_data,
                 file_name=f"proposal_{payload.get('client_name', 'client').replace(' ', '_')}.pdf",
                 mime="application/pdf"
             )
@@ -514,13 +656,16 @@ def render_proposal_results(proposal_result: Dict):
                 file_name=f"proposal_{payload.get('client_name', 'client').replace(' ', '_')}.html",
                 mime="text/html"
             )
-            st.warning("⚠️ PDF generation failed, HTML version available")
+            if pdf_path:
+                st.warning("⚠️ PDF file has expired, HTML version available")
+            else:
+                st.warning("⚠️ PDF generation failed, HTML version available")
         
         else:
             st.error("❌ No downloadable content generated")
         
         # Raw data download
-        proposal_json = json.dumps(payload, indent=2, default=str)
+        proposal_json = _payload_json(proposal_result.get('trace_id', ''), payload)
         st.download_button(
             label="📊 Download Raw Data (JSON)",
             data=proposal_json,
@@ -530,14 +675,19 @@ def render_proposal_results(proposal_result: Dict):
     
     with tab5:
         st.markdown("### Debug Information")
-        st.markdown("**Full MCP Response:**")
-        st.json(proposal_result)
+        # Serializing the full MCP response is skipped unless explicitly requested
+        if st.checkbox("Enable debug view", key="debug_view"):
+            st.markdown("**Full MCP Response:**")
+            st.json(mcp_dumps(proposal_result))
 
 def main():
     """Main application function."""
     # Initialize session state
     initialize_session_state()
     
+    # Apply custom styling
+    st.markdown(f"<style>{_load_css()}</style>", unsafe_allow_html=True)
+    
     # Main title
     st.markdown('<h1 class="main-title">🤖 Automated Proposal & Pricing Agent</h1>', unsafe_allow_html=True)
     
@@ -551,10 +701,6 @@ def main():
     - 📄 **Document generation**
     """)
     
-    # Load orchestrator
-    if not load_orchestrator():
-        st.stop()
-    
     # Render sidebar and handle demo/example loading
     demo_or_example_data = render_sidebar()
     
@@ -580,28 +726,37 @@ def main():
         project_data = render_project_form()
         
         if project_data:
-            # Generate proposal
-            with st.spinner("🔄 Generating proposal... This may take a few minutes."):
-                try:
-                    proposal_result = st.session_state.orchestrator.generate_complete_proposal(project_data)
-                    
-                    # Store results
-                    st.session_state.proposal_data = proposal_result
-                    st.session_state.proposal_generated = True
-                    
-                    # Add to history
-                    st.session_state.generation_history.append({
-                        "timestamp": datetime.now(),
-                        "client_name": project_data.get("client_name"),
-                        "project_title": project_data.get("project_title"),
-                        "success": proposal_result.get('type') != 'GENERATION_ERROR'
-                    })
-                    
-                    st.rerun()
-                    
-                except Exception as e:
-                    st.error(f"❌ Unexpected error: {e}")
-    
+            # Load orchestrator on first use (shared, cached resource)
+            try:
+                orchestrator = get_orchestrator()
+            except Exception as e:
+                st.error(f"❌ Failed to initialize agents: {e}")
+                st.stop()
+            
+            # Generate proposal, previewing each agent's output as it lands
+            render_partial = make_partial_renderer()
+            try:
+                proposal_result = asyncio.run(
+                    orchestrator.generate_complete_proposal(project_data, on_node_complete=render_partial)
+                )
+                proposal_result = _spool_pdf_to_disk(proposal_result)
+                
+                # Store results
+                st.session_state.proposal_data = proposal_result
+                st.session_state.proposal_generated = True
+                
+                # Add to history
+                record_generation(
+                    project_data.get("client_name"),
+                    project_data.get("project_title"),
+                    proposal_result.get('type') != 'GENERATION_ERROR'
+                )
+                
+                st.rerun()
+                
+            except Exception as e:
+                st.error(f"❌ Unexpected error: {e}")
+
     else:
         # Show results
         render_proposal_results(st.session_state.proposal_data)
@@ -612,6 +767,7 @@ def main():
         
         with col1:
             if st.button("🔄 Generate New Proposal", type="primary"):
+                _remove_temp_pdf(st.session_state.proposal_data.get('payload', {}).get('pdf_path'))
                 st.session_state.proposal_generated = False
                 st.session_state.proposal_data = None
                 st.session_state.demo_data = {}  # Clear demo data for fresh start
@@ -620,9 +776,11 @@ def main():
         with col2:
             if st.button("📈 View Generation History"):
                 st.markdown("### 📊 Generation History")
-                for entry in reversed(st.session_state.generation_history):
-                    status = "✅" if entry['success'] else "❌"
-                    st.markdown(f"{status} **{entry['client_name']}** - {entry['project_title']} ({entry['timestamp'].strftime('%Y-%m-%d %H:%M')})")
+                history = st.session_state
+                for i in reversed(range(len(history.history_ts))):
+                    status = "✅" if history.history_ok[i] else "❌"
+                    timestamp = datetime.fromtimestamp(history.history_ts[i]).strftime('%Y-%m-%d %H:%M')
+                    st.markdown(f"{status} **{history.history_client[i]}** - {history.history_title[i]} ({timestamp})")
 
 if __name__ == "__main__":
     main()
@@ -1,12 +1,134 @@
 # orchestrator.py - Main Coordinator for All Agents
 
+import asyncio
+import atexit
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from collections import ChainMap, defaultdict, namedtuple
+from functools import partial
 from agents.pricing_agent import PricingAgent
 from agents.writing_agent import WritingAgent
 from agents.case_study_agent import CaseStudyAgent
-from agents.template_agent import TemplateAgent
+from agents.template_agent import TemplateAgent, render_pdf_in_worker
 from utils.mcp import create_mcp, validate_mcp
-from typing import Dict
+from typing import Callable, Dict, List, Optional
 import streamlit as st
+from tenacity import retry, retry_if_exception_type, stop_after_attempt, wait_exponential
+
+# Progress messages go through logging (configured by the app entry point);
+# per-request lines are DEBUG so production can run this logger at WARNING
+log = logging.getLogger("orchestrator")
+
+# Failures worth retrying: dropped connections and timeouts (TimeoutError
+# also covers asyncio.TimeoutError on Python 3.11+). Deterministic OSErrors
+# such as FileNotFoundError or PermissionError fail immediately.
+TRANSIENT_ERRORS = (ConnectionError, TimeoutError)
+
+def _log_retry(retry_state):
+    log.warning("🔁 Retrying %s after transient error (attempt %d): %s",
+                getattr(retry_state.args[0], "__name__", "agent"),
+                retry_state.attempt_number, retry_state.outcome.exception())
+
+@retry(
+    stop=stop_after_attempt(3),
+    wait=wait_exponential(multiplier=0.5, max=4),
+    retry=retry_if_exception_type(TRANSIENT_ERRORS),
+    before_sleep=_log_retry,
+    reraise=True
+)
+async def _call_agent(fn: Callable, input_mcp: Dict) -> Dict:
+    """
+    Call one agent function, retrying transient failures with exponential backoff.
+    
+    Sync agents run on a worker thread, async agents are awaited directly.
+    Other exceptions propagate immediately; after the last attempt the
+    original exception is re-raised.
+    """
+    if asyncio.iscoroutinefunction(fn):
+        return await fn(input_mcp)
+    return await asyncio.to_thread(fn, input_mcp)
+
+# One step of the proposal pipeline. fn takes an MCP message and returns one
+# (sync or async); depends_on names the nodes whose payloads it consumes;
+# out_types lists the accepted response message types.
+AgentNode = namedtuple("AgentNode", "name fn depends_on out_types")
+
+def topological_levels(nodes: List[AgentNode]) -> List[List[AgentNode]]:
+    """
+    Group nodes into dependency levels using Kahn's algorithm.
+    
+    Every node's dependencies are in earlier levels, so the nodes within a
+    level can run concurrently.
+    
+    Args:
+        nodes: Pipeline nodes
+        
+    Returns:
+        List of levels, each a list of nodes in declaration order
+    """
+    
+    by_name = {node.name: node for node in nodes}
+    indegree = {node.name: len(node.depends_on) for node in nodes}
+    dependents = defaultdict(list)
+    for node in nodes:
+        for dep in node.depends_on:
+            if dep not in by_name:
+                raise ValueError(f"Node '{node.name}' depends on unknown node '{dep}'")
+            dependents[dep].append(node.name)
+    
+    levels = []
+    ready = [node.name for node in nodes if indegree[node.name] == 0]
+    while ready:
+        levels.append([by_name[name] for name in ready])
+        next_ready = []
+        for name in ready:
+            for child in dependents[name]:
+                indegree[child] -= 1
+                if indegree[child] == 0:
+                    next_ready.append(child)
+        ready = next_ready
+    
+    if sum(len(level) for level in levels) != len(nodes):
+        raise ValueError("Pipeline contains a dependency cycle")
+    return levels
+
+# Heavy agents are process-wide singletons: Streamlit hands back the same
+# instance to every session and rerun, so models, indices and templates load
+# once. Shared agents must keep request handling thread-safe (the writing
+# agent serializes model access through its batcher; the case study agent
+# only reads its index and uses thread-safe lru_caches).
+@st.cache_resource(show_spinner=False)
+def _shared_writing_agent() -> WritingAgent:
+    return WritingAgent()
+
+@st.cache_resource(show_spinner=False)
+def _shared_case_study_agent() -> CaseStudyAgent:
+    return CaseStudyAgent()
+
+@st.cache_resource(show_spinner=False)
+def _shared_template_agent() -> TemplateAgent:
+    # Only built if the PDF process pool breaks; workers hold their own copy
+    return TemplateAgent()
+
+def _pdf_mp_context():
+    """
+    Multiprocessing context for the PDF worker pool.
+    
+    Workers must not be forked from this process (it holds model and OpenMP
+    threads). Where available, a forkserver is used: it is a fresh interpreter
+    that preloads the template agent (WeasyPrint, Jinja2) and Streamlit once,
+    and each worker forks from it with those imports already done. Elsewhere
+    fall back to spawn. Either way the app script is re-imported in workers as
+    __mp_main__, where main.py skips its page/logging setup.
+    """
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("forkserver")
+        context.set_forkserver_preload(["agents.template_agent", "streamlit"])
+        return context
+    return multiprocessing.get_context("spawn")
 
 class ProposalOrchestrator:
     """
@@ -14,52 +136,94 @@ class ProposalOrchestrator:
     
     Key concepts to implement:
     1. Agent initialization and management
-    2. Sequential agent execution with error handling
+    2. DAG scheduling: independent agents run concurrently, level by level
     3. Data flow between agents using MCP protocol
-    4. Progress tracking with Streamlit spinners
+    4. Progress tracking with a Streamlit status box and per-node callbacks
     5. Result aggregation and validation
+    
+    One instance is shared by all Streamlit sessions (see get_orchestrator in
+    main.py), so generate_complete_proposal must not mutate instance state.
     """
     
     def __init__(self):
         """
-        Initialize all agents for proposal generation.
+        Initialize all agents for proposal generation (in parallel).
         """
-        print("🚀 Initializing Proposal Orchestrator...")
+        log.info("🚀 Initializing Proposal Orchestrator...")
         
-        # Initialize all agents
+        # Initialize all agents concurrently; loading is mostly disk I/O and
+        # native code, so startup takes as long as the slowest agent. The
+        # template agent lives in the PDF worker processes (see _render_pdf).
         try:
-            print("💰 Loading Pricing Agent...")
-            self.pricing_agent = PricingAgent()
-            
-            print("✍️ Loading Writing Agent...")
-            self.writing_agent = WritingAgent()
+            agents = [
+                ("pricing_agent", PricingAgent, "💰 Pricing Agent"),
+                ("writing_agent", _shared_writing_agent, "✍️ Writing Agent"),
+                ("case_study_agent", _shared_case_study_agent, "🔍 Case Study Agent"),
+            ]
+            with ThreadPoolExecutor(max_workers=len(agents)) as executor:
+                futures = {}
+                for attr, agent_cls, label in agents:
+                    log.info("%s: loading...", label)
+                    future = executor.submit(agent_cls)
+                    future.add_done_callback(
+                        lambda f, label=label: log.info("%s: %s", label, "loaded" if f.exception() is None else "failed")
+                    )
+                    futures[attr] = future
+                
+                # The first failing agent re-raises here
+                for attr, future in futures.items():
+                    setattr(self, attr, future.result())
             
-            print("🔍 Loading Case Study Agent...")
-            self.case_study_agent = CaseStudyAgent()
+            log.info("✅ All agents initialized successfully!")
             
-            print("📄 Loading Template Agent...")
-            self.template_agent = TemplateAgent()
+            # PDF rendering is CPU-bound Python; worker processes keep it off
+            # the GIL so concurrent proposals and the event loop stay responsive.
+            self._pdf_pool = ProcessPoolExecutor(
+                max_workers=min(4, os.cpu_count() or 1),
+                mp_context=_pdf_mp_context()
+            )
+            atexit.register(self._pdf_pool.shutdown)
             
-            print("✅ All agents initialized successfully!")
+            # Pipeline DAG: pricing/writing/cases are independent siblings,
+            # template joins on all three.
+            self.nodes = [
+                AgentNode("pricing", self.pricing_agent.calculate_pricing, [], ("PRICING_CALCULATED",)),
+                AgentNode("writing", self.writing_agent.generate_proposal_sections, [], ("PROPOSAL_SECTIONS_GENERATED",)),
+                AgentNode("cases", partial(self.case_study_agent.retrieve_relevant_cases_async, k=3), [], ("CASE_STUDIES_RETRIEVED",)),
+                AgentNode("template", self._render_pdf, ["pricing", "writing", "cases"],
+                          ("PDF_GENERATED", "HTML_GENERATED")),  # HTML is the PDF fallback
+            ]
+            self._levels = topological_levels(self.nodes)
             
         except Exception as e:
-            print(f"❌ Agent initialization failed: {e}")
+            log.error("❌ Agent initialization failed: %s", e)
             raise e
     
-    def generate_complete_proposal(self, project_data: Dict) -> Dict:
+    async def generate_complete_proposal(self, project_data: Dict,
+                                         on_node_complete: Optional[Callable[[str, Dict], None]] = None) -> Dict:
         """
         Orchestrate all agents to generate complete proposal.
         
         Flow:
         1. Create initial MCP message from project data
-        2. Call pricing agent -> get pricing breakdown
-        3. Call writing agent -> get proposal sections
-        4. Call case study agent -> get relevant examples
-        5. Combine all data and call template agent -> get final PDF
+        2. Group agent nodes into dependency levels (see self.nodes)
+        3. Run each level concurrently, validating every node's response
+        4. Merge all node payloads into the final response
+        
+        Call from synchronous code with asyncio.run(...).
+        
+        Args:
+            project_data: Project details from the UI
+            on_node_complete: Optional callback(node_name, mcp) invoked as soon as
+                each node succeeds, so the UI can show partial results early
         
         Returns: MCP message with final PDF and all data
         """
         
+        # Layered view over project data + payloads of every node finished so
+        # far (newest first); nothing is copied until a consumer needs a dict
+        combined_data = ChainMap(project_data)
+        
         try:
             # Step 1: Create initial MCP message from project data
             project_mcp = create_mcp(
@@ -69,79 +233,48 @@ class ProposalOrchestrator:
                 payload=project_data
             )
             
-            print(f"📋 Starting proposal generation for {project_data.get('client_name', 'Client')}")
-            
-            # Step 2: Calculate pricing
-            with st.spinner("💰 Calculating pricing..."):
-                pricing_mcp = self.pricing_agent.calculate_pricing(project_mcp)
-                
-                if not validate_mcp(pricing_mcp, "PRICING_CALCULATED"):
-                    raise Exception("Pricing calculation failed - invalid MCP response")
-                
-                print(f"✅ Pricing calculated: ${pricing_mcp['payload']['pricing']['total']:,.2f}")
-            
-            # Step 3: Generate proposal sections
-            with st.spinner("✍️ Writing proposal sections..."):
-                sections_mcp = self.writing_agent.generate_proposal_sections(project_mcp)
-                
-                if not validate_mcp(sections_mcp, "PROPOSAL_SECTIONS_GENERATED"):
-                    raise Exception("Proposal writing failed - invalid MCP response")
-                
-                sections = sections_mcp['payload']['sections']
-                print(f"✅ Generated {len(sections)} proposal sections")
+            log.debug("📋 Starting proposal generation for %s", project_data.get('client_name', 'Client'))
             
-            # Step 4: Retrieve relevant case studies
-            with st.spinner("🔍 Finding relevant case studies..."):
-                cases_mcp = self.case_study_agent.retrieve_relevant_cases(project_mcp, k=3)
-                
-                if not validate_mcp(cases_mcp, "CASE_STUDIES_RETRIEVED"):
-                    raise Exception("Case study retrieval failed - invalid MCP response")
+            # Steps 2-3: Run the DAG level by level. Nodes within a level are
+            # independent and run concurrently; blocking agents run on worker threads.
+            results = {}
+            with st.status("Building proposal...", expanded=True) as status:
+                for level in self._levels:
+                    outputs = await asyncio.gather(
+                        *(self._tracked(status, node.name, self._run_node(node, project_mcp, results), on_node_complete)
+                          for node in level),
+                        return_exceptions=True
+                    )
+                    
+                    # First failure in a level aborts the pipeline
+                    for node, mcp in zip(level, outputs):
+                        if isinstance(mcp, BaseException):
+                            status.update(label=f"❌ {node.name} failed", state="error")
+                            raise Exception(f"{node.name} failed - {mcp}")
+                        results[node.name] = mcp
+                        combined_data = combined_data.new_child(mcp["payload"])
                 
-                relevant_cases = cases_mcp['payload']['relevant_cases']
-                print(f"✅ Found {len(relevant_cases)} relevant case studies")
+                status.update(label="✅ Proposal ready", state="complete", expanded=False)
             
-            # Step 5: Combine all data for template generation
-            combined_data = {
-                **project_data,  # Original project data
-                "pricing": pricing_mcp["payload"]["pricing"],
-                "sections": sections_mcp["payload"]["sections"],
-                "relevant_cases": cases_mcp["payload"]["relevant_cases"]
-            }
-            
-            combined_mcp = create_mcp(
-                sender="Orchestrator",
-                receiver="TemplateAgent",
-                msg_type="GENERATE_PDF",
-                payload=combined_data
-            )
-            
-            # Step 6: Generate final PDF
-            with st.spinner("📄 Generating PDF proposal..."):
-                pdf_mcp = self.template_agent.generate_pdf_proposal(combined_mcp)
-                
-                # Accept both PDF_GENERATED and HTML_GENERATED (fallback)
-                if not validate_mcp(pdf_mcp, "PDF_GENERATED") and not validate_mcp(pdf_mcp, "HTML_GENERATED"):
-                    raise Exception("PDF generation failed - invalid MCP response")
-                
-                print(f"✅ Final document generated: {pdf_mcp['type']}")
+            final_mcp = results[self._levels[-1][-1].name]
             
-            # Step 7: Combine all data into final response
-            final_payload = {
-                **combined_data,  # All the combined data from previous steps
-                **pdf_mcp["payload"]  # Add PDF/HTML content from template agent
-            }
+            if log.isEnabledFor(logging.DEBUG):
+                log.debug("✅ Pricing calculated: $%s", f"{results['pricing']['payload']['pricing']['total']:,.2f}")
+                log.debug("✅ Generated %d proposal sections", len(results['writing']['payload']['sections']))
+                log.debug("✅ Found %d relevant case studies", len(results['cases']['payload']['relevant_cases']))
+                log.debug("✅ Final document generated: %s", final_mcp['type'])
             
-            # Return complete result with all agent outputs
+            # Step 4: Return complete result with all agent outputs
             return create_mcp(
                 sender="Orchestrator",
                 receiver="UserInterface", 
-                msg_type=pdf_mcp["type"],  # Keep the PDF_GENERATED or HTML_GENERATED type
-                payload=final_payload
+                msg_type=final_mcp["type"],  # Keep the PDF_GENERATED or HTML_GENERATED type
+                payload=combined_data
             )
             
         except Exception as e:
             st.error(f"❌ Proposal generation failed: {str(e)}")
-            print(f"❌ Orchestration error: {e}")
+            log.error("❌ Orchestration error: %s", e)
             
             # Return error MCP
             return create_mcp(
@@ -150,6 +283,91 @@ class ProposalOrchestrator:
                 msg_type="GENERATION_ERROR",
                 payload={
                     "error": str(e),
-                    "partial_data": locals().get('combined_data', {})
+                    "partial_data": combined_data
                 }
             )
+    
+    async def _run_node(self, node: AgentNode, project_mcp: Dict, results: Dict) -> Dict:
+        """
+        Execute one agent node and validate its response.
+        
+        Root nodes receive the project MCP unchanged; join nodes receive a
+        ChainMap view of the project data and their predecessors' payloads.
+        
+        Args:
+            node: Node to execute
+            project_mcp: Initial PROPOSAL_REQUEST message
+            results: Responses of already finished nodes, keyed by node name
+            
+        Returns:
+            The node's validated MCP response
+        """
+        
+        if node.depends_on:
+            # Later dependencies take precedence, so they go first in the chain
+            payload = ChainMap(*(results[dep]["payload"] for dep in reversed(node.depends_on)),
+                               project_mcp["payload"])
+            input_mcp = create_mcp(
+                sender="Orchestrator",
+                receiver=node.name,
+                msg_type=f"{node.name.upper()}_REQUEST",
+                payload=payload
+            )
+        else:
+            input_mcp = project_mcp
+        
+        mcp = await _call_agent(node.fn, input_mcp)
+        
+        if not any(validate_mcp(mcp, out_type) for out_type in node.out_types):
+            raise Exception("invalid MCP response")
+        return mcp
+    
+    async def _render_pdf(self, combined_mcp: Dict) -> Dict:
+        """
+        Run the template agent in the PDF process pool.
+        
+        The ChainMap payload is materialized into a plain dict before crossing
+        the process boundary. If the pool is unusable, an in-process template
+        agent is built on first need and renders on a worker thread.
+        """
+        picklable_mcp = {**combined_mcp, "payload": dict(combined_mcp["payload"])}
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(self._pdf_pool, render_pdf_in_worker, picklable_mcp)
+        except BrokenProcessPool as e:
+            log.warning("⚠️ PDF worker pool unavailable (%s), rendering in-process", e)
+            return await asyncio.to_thread(
+                lambda: _shared_template_agent().generate_pdf_proposal(picklable_mcp)
+            )
+    
+    @staticmethod
+    def _tracked(status, label: str, coro, on_complete: Optional[Callable[[str, Dict], None]] = None) -> asyncio.Task:
+        """
+        Schedule an agent coroutine and report its completion as soon as it finishes.
+        
+        Args:
+            status: Streamlit status container to write progress into
+            label: Node name
+            coro: Agent coroutine to run
+            on_complete: Optional callback(label, mcp) for successful results
+            
+        Returns:
+            The scheduled asyncio task
+        """
+        task = asyncio.ensure_future(coro)
+        
+        def _report(done: asyncio.Task):
+            if done.cancelled() or done.exception() is not None:
+                status.write(f"❌ {label} failed")
+                return
+            status.update(label=f"✓ {label} done")
+            status.write(f"✅ {label} done")
+            if on_complete is not None:
+                try:
+                    on_complete(label, done.result())
+                except Exception as e:
+                    # A broken preview must not fail the proposal
+                    log.warning("⚠️ Progress callback failed for %s: %s", label, e)
+        
+        task.add_done_callback(_report)
+        return task
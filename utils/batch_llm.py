@@ -0,0 +1,129 @@
+# utils/batch_llm.py - Micro-batching front end for LLM generation
+
+import asyncio
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, List
+
+# How long the dispatcher waits for more prompts before running a batch
+MAX_BATCH_WAIT_MS = 20
+
+class BatchLLMClient:
+    """
+    Collects prompts from concurrent callers and runs them as shared batches.
+
+    Key concepts:
+    1. Callers submit single prompts and get a Future back
+    2. A dispatcher thread groups prompts that arrive within a short window
+    3. Each group is sent through one batched generate call
+    4. The single dispatcher also serializes access to the underlying model
+
+    Args:
+        generate_fn: Batch generation function (list of prompts -> list of completions)
+        max_batch_size: Maximum number of prompts per generate call
+        max_batch_wait_ms: Time to wait for more prompts after the first arrives
+    """
+
+    def __init__(self, generate_fn: Callable[[List[str]], List[str]],
+                 max_batch_size: int = 16, max_batch_wait_ms: int = MAX_BATCH_WAIT_MS):
+        self.generate_fn = generate_fn
+        self.max_batch_size = max_batch_size
+        self.max_batch_wait = max_batch_wait_ms / 1000.0
+
+        self._queue = queue.Queue()
+        self._closed = False
+        self._worker = threading.Thread(target=self._dispatch_loop, name="BatchLLMClient", daemon=True)
+        self._worker.start()
+
+    def submit(self, prompt: str) -> Future:
+        """
+        Queue one prompt for generation.
+
+        Args:
+            prompt: Fully formatted prompt
+
+        Returns:
+            Future resolving to the generated text
+        """
+
+        if self._closed:
+            raise RuntimeError("BatchLLMClient is closed")
+        if not self._worker.is_alive():
+            raise RuntimeError("BatchLLMClient dispatcher thread is not running")
+
+        future = Future()
+        self._queue.put((prompt, future))
+        return future
+
+    def generate(self, prompts: List[str]) -> List[str]:
+        """Submit several prompts and block until all completions are ready (in prompt order)."""
+        futures = [self.submit(prompt) for prompt in prompts]
+        return [future.result() for future in futures]
+
+    async def agenerate(self, prompt: str) -> str:
+        """Awaitable variant of submit() for use inside an event loop."""
+        return await asyncio.wrap_future(self.submit(prompt))
+
+    def close(self):
+        """Stop the dispatcher once queued prompts have been processed."""
+        if not self._closed:
+            self._closed = True
+            self._queue.put(None)
+            self._worker.join()
+
+    def _dispatch_loop(self):
+        """Dispatcher thread: gather prompts into batches and run them."""
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+
+            # Collect whatever else arrives within the batching window
+            batch = [item]
+            deadline = time.monotonic() + self.max_batch_wait
+            stop = False
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
+
+            self._run_batch(batch)
+            if stop:
+                return
+
+    def _run_batch(self, batch: List[tuple]):
+        """
+        Run one generate call and resolve each caller's future.
+
+        Never raises: cancelled callers are dropped before generating, and any
+        failure (including a short output list) is delivered to the remaining
+        futures so the dispatcher thread keeps running.
+        """
+
+        # Claim the futures; ones cancelled while queued (e.g. an abandoned
+        # agenerate() await) are skipped and can no longer be cancelled
+        batch = [(prompt, future) for prompt, future in batch if future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+
+        try:
+            outputs = self.generate_fn([prompt for prompt, _ in batch])
+            if len(outputs) != len(batch):
+                raise RuntimeError(f"generate_fn returned {len(outputs)} outputs for {len(batch)} prompts")
+        except BaseException as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+
+        for (_, future), output in zip(batch, outputs):
+            future.set_result(output)
@@ -1,8 +1,90 @@
 # utils/mcp.py - Message Communication Protocol
 
-import uuid
+import os
+from collections.abc import Mapping
 from datetime import datetime
 from typing import Dict, Any
+import orjson
+from pydantic import BaseModel, ConfigDict, ValidationError, field_validator
+
+# Keys every MCP message must carry
+_REQUIRED_MCP_KEYS = frozenset(("type", "sender", "receiver", "trace_id", "timestamp", "payload"))
+
+class MCPMessage(BaseModel):
+    """Schema of the MCP envelope; compiled once by pydantic at import time."""
+    model_config = ConfigDict(extra="allow")
+    
+    type: str
+    sender: str
+    receiver: str
+    trace_id: str
+    timestamp: str
+    payload: Any  # Checked with isinstance(Mapping) in validate_mcp; not copied
+
+class _PayloadModel(BaseModel):
+    model_config = ConfigDict(extra="allow")
+
+# Container fields are typed Any and checked by plain validators that return
+# the original object: pydantic would otherwise rebuild every nested dict
+# (e.g. each ChainMap case hit) just to throw the copy away.
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+class _PricingPayload(_PayloadModel):
+    pricing: Any
+    
+    @field_validator("pricing", mode="plain")
+    @classmethod
+    def _check_pricing(cls, value):
+        if not isinstance(value, Mapping):
+            raise ValueError("pricing must be a mapping")
+        if not all(_is_number(value.get(key)) for key in ("subtotal", "tax", "total")):
+            raise ValueError("pricing needs numeric subtotal, tax and total")
+        return value
+
+class _SectionsPayload(_PayloadModel):
+    sections: Any
+    
+    @field_validator("sections", mode="plain")
+    @classmethod
+    def _check_sections(cls, value):
+        if not isinstance(value, Mapping) or not all(
+            isinstance(name, str) and isinstance(text, str) for name, text in value.items()
+        ):
+            raise ValueError("sections must map section names to text")
+        return value
+
+class _CasesPayload(_PayloadModel):
+    relevant_cases: Any
+    
+    @field_validator("relevant_cases", mode="plain")
+    @classmethod
+    def _check_cases(cls, value):
+        if not isinstance(value, list) or not all(isinstance(case, Mapping) for case in value):
+            raise ValueError("relevant_cases must be a list of mappings")
+        return value
+
+class _PdfPayload(_PayloadModel):
+    pdf_bytes: bytes
+    html_content: str
+
+class _HtmlPayload(_PayloadModel):
+    html_content: str
+
+# Payload shape required for each agent response type; other types only
+# need a valid envelope
+_PAYLOAD_MODELS = {
+    "PRICING_CALCULATED": _PricingPayload,
+    "PROPOSAL_SECTIONS_GENERATED": _SectionsPayload,
+    "CASE_STUDIES_RETRIEVED": _CasesPayload,
+    "PDF_GENERATED": _PdfPayload,
+    "HTML_GENERATED": _HtmlPayload,
+}
+
+def _now_iso() -> str:
+    """Current local time as an ISO-8601 string with millisecond precision."""
+    return datetime.now().isoformat(timespec="milliseconds")
 
 def create_mcp(sender: str, receiver: str, msg_type: str, payload: Dict[Any, Any]) -> Dict:
     """
@@ -29,7 +111,7 @@ def create_mcp(sender: str, receiver: str, msg_type: str, payload: Dict[Any, Any
     # - type: msg_type
     # - sender: sender agent name
     # - receiver: receiver agent name  
-    # - trace_id: unique UUID for tracking
+    # - trace_id: unique 128-bit random hex id for tracking
     # - timestamp: current ISO timestamp
     # - payload: the actual data
 
@@ -37,8 +119,8 @@ def create_mcp(sender: str, receiver: str, msg_type: str, payload: Dict[Any, Any
         "type":msg_type,
         "sender":sender,
         "receiver":receiver,
-        "trace_id":str(uuid.uuid4()),
-        "timestamp":datetime.now().isoformat(),
+        "trace_id":os.urandom(16).hex(),
+        "timestamp":_now_iso(),
         "payload":payload
     }
     
@@ -58,6 +140,9 @@ def validate_mcp(mcp: Dict, expected_type: str = None) -> bool:
     
     Returns:
         True if valid, False otherwise
+    
+    Besides the envelope, payloads of agent response types (pricing, sections,
+    case studies, PDF/HTML) are checked against their schema.
     """
     
     # TODO: Implement validation logic
@@ -65,10 +150,56 @@ def validate_mcp(mcp: Dict, expected_type: str = None) -> bool:
     # Optionally check if type matches expected_type
     # Return True/False based on validation
     
-    required_keys=["type","sender","receiver","trace_id","timestamp","payload"]
-    if not all(key in mcp for key in required_keys):
+    # Single C-level subset test against the dict's key view
+    if not _REQUIRED_MCP_KEYS <= mcp.keys():
         return False
     
     if expected_type and mcp["type"]!=expected_type:
         return False
-    return True
\ No newline at end of file
+    
+    # Envelope field types plus the payload shape for known message types,
+    # so malformed agent output is rejected here rather than deep downstream
+    payload = mcp["payload"]
+    if not isinstance(payload, Mapping):
+        return False
+    try:
+        MCPMessage.model_validate(mcp)
+        payload_model = _PAYLOAD_MODELS.get(mcp["type"])
+        if payload_model is not None:
+            payload_model.model_validate(payload)
+    except ValidationError:
+        return False
+    return True
+
+
+def _json_default(obj):
+    """Serializer fallback: materialize mapping views (e.g. ChainMap payloads), stringify the rest."""
+    if isinstance(obj, Mapping):
+        return dict(obj)
+    return str(obj)
+
+def dumps_bytes(mcp: Dict, indent: bool = False) -> bytes:
+    """
+    Serialize an MCP message (or payload) to UTF-8 JSON bytes with orjson.
+    
+    Key concepts:
+    1. Native serialization of numpy arrays and non-string dict keys
+    2. Mapping views and unknown objects handled by a fallback
+    3. Bytes output for sinks that accept bytes (files, downloads, network)
+    
+    Args:
+        mcp: Message or payload to serialize
+        indent: Pretty-print with two-space indentation
+    
+    Returns:
+        JSON document as bytes
+    """
+    
+    option = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+    if indent:
+        option |= orjson.OPT_INDENT_2
+    return orjson.dumps(mcp, default=_json_default, option=option)
+
+def dumps(mcp: Dict, indent: bool = False) -> str:
+    """Serialize an MCP message (or payload) to a JSON string; see dumps_bytes."""
+    return dumps_bytes(mcp, indent=indent).decode("utf-8")
@@ -0,0 +1,82 @@
+# utils/onnx_embedder.py - Quantized ONNX Runtime Sentence Encoder
+
+import os
+import numpy as np
+from typing import List
+
+class OnnxSentenceEncoder:
+    """
+    Int8-quantized ONNX Runtime replacement for SentenceTransformer.encode.
+    
+    Key concepts:
+    1. One-time ONNX export of the transformer with optimum
+    2. Dynamic int8 quantization (AVX-512 VNNI kernels)
+    3. Tokenize -> ONNX session -> mean pooling -> L2 normalization in NumPy
+    
+    Only suitable for models that use mean pooling (e.g. all-MiniLM-L6-v2).
+    Requires `optimum[onnxruntime]`; construction raises ImportError otherwise.
+    """
+    
+    QUANTIZED_FILE = "model_quantized.onnx"
+    
+    def __init__(self, model_name: str, export_dir: str, max_length: int = 256):
+        """
+        Export and quantize the model on first use, then load the ONNX session.
+        
+        Args:
+            model_name: Hugging Face model id to export
+            export_dir: Directory holding the exported + quantized model
+            max_length: Maximum tokens per input (MiniLM was trained with 256)
+        """
+        
+        import onnxruntime
+        from transformers import AutoTokenizer
+        
+        quantized_path = os.path.join(export_dir, self.QUANTIZED_FILE)
+        if not os.path.exists(quantized_path):
+            from optimum.onnxruntime import ORTModelForFeatureExtraction, ORTQuantizer
+            from optimum.onnxruntime.configuration import AutoQuantizationConfig
+            
+            print(f"🔄 Exporting {model_name} to ONNX and quantizing to int8...")
+            ort_model = ORTModelForFeatureExtraction.from_pretrained(model_name, export=True)
+            quantizer = ORTQuantizer.from_pretrained(ort_model)
+            quantizer.quantize(
+                save_dir=export_dir,
+                quantization_config=AutoQuantizationConfig.avx512_vnni(is_static=False, per_channel=False)
+            )
+            AutoTokenizer.from_pretrained(model_name).save_pretrained(export_dir)
+            print(f"✅ Quantized ONNX model saved to {export_dir}")
+        
+        self.tokenizer = AutoTokenizer.from_pretrained(export_dir)
+        self.session = onnxruntime.InferenceSession(quantized_path, providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        self.max_length = max_length
+    
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """
+        Encode texts into L2-normalized float32 embeddings.
+        
+        Args:
+            texts: Sentences to embed
+            
+        Returns:
+            Array of shape (len(texts), dim), ready for FAISS inner-product search
+        """
+        
+        inputs = self.tokenizer(
+            texts,
+            padding=True,
+            truncation=True,
+            max_length=self.max_length,
+            return_tensors="np"
+        )
+        feeds = {name: value.astype(np.int64) for name, value in inputs.items() if name in self.input_names}
+        token_embeddings = self.session.run(None, feeds)[0]
+        
+        # Mean pooling over non-padding tokens
+        mask = inputs["attention_mask"][..., None].astype(np.float32)
+        embeddings = (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        
+        # L2 normalization for cosine similarity
+        embeddings /= np.clip(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12, None)
+        return embeddings.astype(np.float32, copy=False)
@@ -0,0 +1,140 @@
+# utils/semantic_cache.py - Embedding-keyed cache for near-duplicate searches
+
+import os
+import threading
+import numpy as np
+from typing import Optional, Tuple
+
+class SemanticCache:
+    """
+    Cache of top-k search results keyed by query embedding rather than exact text.
+
+    Key concepts:
+    1. Lookups match the most similar stored query with the same k (cosine similarity)
+    2. A hit requires similarity >= threshold, so only near-duplicates match
+    3. Fixed-size ring buffer: the oldest entry is overwritten when full
+    4. Purely numeric storage, persisted with np.savez and loaded without pickle;
+       a tag ties saved entries to the corpus they were computed for
+
+    Args:
+        dim: Embedding dimension
+        threshold: Minimum cosine similarity for a hit
+        max_size: Maximum number of cached entries
+        max_k: Largest k that can be cached
+        tag: Identifier of what the cached indices refer to (e.g. a corpus
+             fingerprint); a saved cache with a different tag is not loaded
+    """
+
+    def __init__(self, dim: int, threshold: float = 0.95, max_size: int = 1024,
+                 max_k: int = 16, tag: str = ""):
+        self.dim = dim
+        self.threshold = threshold
+        self.max_size = max_size
+        self.max_k = max_k
+        self.tag = tag
+
+        self._vecs = np.zeros((max_size, dim), np.float32)
+        self._ks = np.zeros(max_size, np.int32)              # 0 marks an empty slot
+        self._scores = np.zeros((max_size, max_k), np.float32)
+        self._ids = np.full((max_size, max_k), -1, np.int64)
+        self._n = 0       # Number of filled slots
+        self._next = 0    # Slot the next put() writes to
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self._n
+
+    @staticmethod
+    def _normalize(vec: np.ndarray) -> np.ndarray:
+        vec = np.asarray(vec, dtype=np.float32).reshape(-1)
+        norm = np.linalg.norm(vec)
+        return vec / norm if norm > 0 else vec
+
+    def lookup(self, qvec: np.ndarray, k: int) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Return the cached top-k result of the most similar earlier query.
+
+        Args:
+            qvec: Query embedding (any shape with dim elements)
+            k: Number of results the caller needs
+
+        Returns:
+            (scores, indices) arrays of length k on a hit, None on a miss
+        """
+
+        qvec = self._normalize(qvec)
+        with self._lock:
+            if self._n == 0:
+                return None
+            similarities = self._vecs[:self._n] @ qvec
+            similarities[self._ks[:self._n] != k] = -np.inf
+            best = int(np.argmax(similarities))
+            if similarities[best] >= self.threshold:
+                return self._scores[best, :k].copy(), self._ids[best, :k].copy()
+        return None
+
+    def put(self, qvec: np.ndarray, scores: np.ndarray, indices: np.ndarray):
+        """Store one top-k result under qvec, evicting the oldest entry when full."""
+        k = len(indices)
+        if not 0 < k <= self.max_k:
+            return
+        qvec = self._normalize(qvec)
+        with self._lock:
+            slot = self._next
+            self._vecs[slot] = qvec
+            self._ks[slot] = k
+            self._scores[slot, :k] = scores
+            self._ids[slot, :k] = indices
+            self._next = (slot + 1) % self.max_size
+            self._n = min(self._n + 1, self.max_size)
+
+    def save(self, path: str):
+        """Write the cache contents to an .npz file (numeric arrays only)."""
+        with self._lock:
+            n = self._n
+            arrays = {
+                "tag": np.array(self.tag),
+                "vecs": self._vecs[:n].copy(),
+                "ks": self._ks[:n].copy(),
+                "scores": self._scores[:n].copy(),
+                "ids": self._ids[:n].copy()
+            }
+        np.savez(path, **arrays)
+
+    def load(self, path: str) -> bool:
+        """
+        Restore entries saved by save().
+
+        Args:
+            path: File written by save()
+
+        Returns:
+            True if entries were loaded, False if the file was missing,
+            unreadable, or saved for a different tag/shape
+        """
+
+        if not os.path.exists(path):
+            return False
+        try:
+            with np.load(path, allow_pickle=False) as saved:
+                tag = str(saved["tag"])
+                vecs, ks, scores, ids = saved["vecs"], saved["ks"], saved["scores"], saved["ids"]
+        except Exception as e:
+            print(f"⚠️ Ignoring unreadable semantic cache: {e}")
+            return False
+
+        if (tag != self.tag or vecs.ndim != 2 or vecs.shape[1] != self.dim
+                or scores.shape != (len(vecs), self.max_k) or ids.shape != scores.shape
+                or ks.shape != (len(vecs),)):
+            return False
+
+        # Keep at most max_size entries if the saved cache was larger
+        n = min(len(vecs), self.max_size)
+        with self._lock:
+            self._vecs[:n] = vecs[:n]
+            self._ks[:n] = ks[:n]
+            self._scores[:n] = scores[:n]
+            self._ids[:n] = ids[:n]
+            self._n = n
+            self._next = n % self.max_size
+        return True